@@ -0,0 +1,67 @@
+# RepoExplorer: A utility to quickly familiarize oneself with a code repo.
+# Copyright (C) 2019  Jon Stockton <jonstockton1416@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import json
+import os
+import sqlite3
+
+class BlobCache:
+    """
+        Persistent results of per-file work (file types, parsed imports...)
+        keyed by blob sha
+
+        A blob's content never changes, so a result stays good for as long as
+        any commit in any repo has that blob - unchanged files are never looked
+        at twice.  Each kind of result has its own table.
+    """
+    # Keep "IN (...)" lookups under SQLite's parameter limit
+    BATCH_SIZE = 500
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.tables = set()
+
+    def getTable(self, kind):
+        if kind not in self.tables:
+            if not kind.isidentifier():
+                raise ValueError("Invalid blob cache table: %s" % (kind))
+            self.db.execute("CREATE TABLE IF NOT EXISTS %s (sha TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID" % (kind))
+            self.tables.add(kind)
+        return kind
+
+    def getMany(self, kind, shas):
+        """
+            {sha: value} for the shas that have a result
+        """
+        table = self.getTable(kind)
+        shas = list(shas)
+        found = {}
+        for i in range(0, len(shas), self.BATCH_SIZE):
+            batch = shas[i:i + self.BATCH_SIZE]
+            query = "SELECT sha, value FROM %s WHERE sha IN (%s)" % (table, ",".join("?" * len(batch)))
+            for sha, value in self.db.execute(query, batch):
+                found[sha] = json.loads(value)
+        return found
+
+    def putMany(self, kind, results):
+        table = self.getTable(kind)
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO %s VALUES (?, ?)" % (table),
+                [(sha, json.dumps(value)) for (sha, value) in results.items()])
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,114 @@
+# RepoExplorer: A utility to quickly familiarize oneself with a code repo.
+# Copyright (C) 2019  Jon Stockton <jonstockton1416@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import gzip
+import json
+
+# See docs/CACHE_FILES.md for the layout
+CACHE_FORMAT = "repo-explorer-cache"
+CACHE_VERSION = 2
+GZIP_MAGIC = b"\x1f\x8b"
+
+def writeLine(f, value):
+    f.write(json.dumps(value, separators=(",", ":")))
+    f.write("\n")
+
+def writeCache(path, cache):
+    """
+        Write a cache (as returned by Explorer.getCache()) one record per line so
+        the whole thing never has to be serialized at once
+    """
+    data = cache['data']
+
+    # Intern authors and paths, commits refer to them by index
+    authors = {}
+    paths = {}
+    for commit in data['commits'].values():
+        authors.setdefault(commit['author'], len(authors))
+        for file, file_info in (commit['files'] or {}).items():
+            paths.setdefault(file, len(paths))
+            if "a_path" in file_info:
+                paths.setdefault(file_info['a_path'], len(paths))
+    for author in data['authors']:
+        authors.setdefault(author, len(authors))
+    for file in data['files']:
+        paths.setdefault(file, len(paths))
+
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=1) as f:
+        writeLine(f, {
+            "format": CACHE_FORMAT,
+            "version": CACHE_VERSION,
+            "timestamp": cache['timestamp'],
+            "last_commit": cache.get('last_commit'),
+            "commits": len(data['commits'])
+        })
+        writeLine(f, list(authors))
+        writeLine(f, list(paths))
+        writeLine(f, cache['renames'])
+        writeLine(f, [[authors[author], stats] for (author, stats) in data['authors'].items()])
+        writeLine(f, [[paths[file], stats] for (file, stats) in data['files'].items()])
+
+        for commit_hash, commit in data['commits'].items():
+            files = None
+            if commit['files'] is not None:
+                file_infos = list(commit['files'].items())
+                files = [
+                    [paths[file] for (file, file_info) in file_infos],
+                    "".join(file_info['type'] for (file, file_info) in file_infos),
+                    [file_info['add'] for (file, file_info) in file_infos],
+                    [file_info['del'] for (file, file_info) in file_infos],
+                    [paths[file_info['a_path']] if "a_path" in file_info else -1 for (file, file_info) in file_infos]
+                ]
+                if any(file_info['diff'] is not None for (file, file_info) in file_infos):
+                    files.append([file_info['diff'] for (file, file_info) in file_infos])
+            writeLine(f, [commit_hash, authors[commit['author']], commit['date'], files])
+
+def readCache(path):
+    with open(path, "rb") as f:
+        is_compressed = f.read(2) == GZIP_MAGIC
+
+    # Caches written before the format was versioned are a single JSON document
+    if not is_compressed:
+        with open(path, "r") as f:
+            return json.load(f)
+
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get('format') != CACHE_FORMAT or header.get('version') != CACHE_VERSION:
+            raise Exception("Unsupported cache format: %s v%s" % (header.get('format'), header.get('version')))
+
+        authors = json.loads(f.readline())
+        paths = json.loads(f.readline())
+        renames = json.loads(f.readline())
+        data = {
+            "authors": {authors[author]: stats for (author, stats) in json.loads(f.readline())},
+            "files": {paths[file]: stats for (file, stats) in json.loads(f.readline())},
+            "commits": {}
+        }
+
+        for line in f:
+            commit_hash, author, date, files = json.loads(line)
+            file_infos = None
+            if files is not None:
+                file_infos = {}
+                diffs = files[5] if len(files) > 5 else None
+                for i, file in enumerate(files[0]):
+                    file_info = {"add": files[2][i], "del": files[3][i], "type": files[1][i], "diff": diffs[i] if diffs else None}
+                    if files[4][i] != -1:
+                        file_info['a_path'] = paths[files[4][i]]
+                    file_infos[paths[file]] = file_info
+            data['commits'][commit_hash] = {"author": authors[author], "files": file_infos, "date": date}
+
+    return {"data": data, "renames": renames, "last_commit": header['last_commit'], "timestamp": header['timestamp']}
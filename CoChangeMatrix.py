@@ -0,0 +1,215 @@
+# RepoExplorer: A utility to quickly familiarize oneself with a code repo.
+# Copyright (C) 2019  Jon Stockton <jonstockton1416@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import array
+import collections.abc
+
+# NumPy/SciPy are optional, without them we fall back to counting in dicts
+try:
+    import numpy
+    import scipy.sparse
+except ImportError:
+    numpy = None
+
+class CoChangeMatrix(collections.abc.Mapping):
+    """
+        File co-change counts for dependency inference
+
+        Paths are interned to integer ids and every commit becomes a row of a
+        commit x file incidence matrix A.  Occurrences of files we're analyzing
+        (everything, or only the top files) are also flagged in T, so the counts
+        are T.T @ A + A.T @ T - the same numbers the old nested loops produced.
+        Counts worked out elsewhere (e.g. while streaming) can be added as pairs.
+        Reads like the old nested dict: matrix[file] -> {related_file: count}
+    """
+    def __init__(self):
+        self.ids = {}
+        self.paths = []
+        self.commits = 0
+        self.rows = array.array('q')
+        self.cols = array.array('q')
+        self.tops = array.array('b')
+        self.pair_rows = array.array('q')
+        self.pair_cols = array.array('q')
+        self.pair_counts = array.array('q')
+        self.analyzed_files = set()
+        self.counts = None
+        self.keys = []
+        self.key_set = set()
+        self.relations = {}
+
+    def getId(self, path):
+        if path not in self.ids:
+            self.ids[path] = len(self.paths)
+            self.paths.append(path)
+        return self.ids[path]
+
+    def addCommit(self, occurrences):
+        """
+            occurrences - [(path, is_analyzed), ...] for each usable file in the commit
+        """
+        for path, is_analyzed in occurrences:
+            self.rows.append(self.commits)
+            self.cols.append(self.getId(path))
+            self.tops.append(1 if is_analyzed else 0)
+        self.commits += 1
+
+    def addFile(self, path, is_analyzed):
+        """
+            A file that's counted through addPair() rather than addCommit()
+        """
+        file = self.getId(path)
+        if is_analyzed:
+            self.analyzed_files.add(file)
+
+    def addPair(self, path, related_path, count):
+        """
+            Add an already weighted count to a pair of files, in both directions
+        """
+        self.pair_rows.append(self.getId(path))
+        self.pair_cols.append(self.getId(related_path))
+        self.pair_counts.append(count)
+
+    def build(self, threshold=0, limit=-1):
+        if numpy is None:
+            self.buildDicts(threshold, limit)
+        else:
+            self.buildSparse(threshold, limit)
+        return self
+
+    def buildSparse(self, threshold, limit):
+        shape = (self.commits, len(self.paths))
+        rows = numpy.frombuffer(self.rows, dtype=numpy.int64) if len(self.rows) else numpy.zeros(0, dtype=numpy.int64)
+        cols = numpy.frombuffer(self.cols, dtype=numpy.int64) if len(self.cols) else numpy.zeros(0, dtype=numpy.int64)
+        tops = numpy.frombuffer(self.tops, dtype=numpy.int8).astype(numpy.int64) if len(self.tops) else numpy.zeros(0, dtype=numpy.int64)
+
+        incidence = scipy.sparse.csr_matrix((numpy.ones(len(rows), dtype=numpy.int64), (rows, cols)), shape=shape)
+        analyzed = scipy.sparse.csr_matrix((tops, (rows, cols)), shape=shape)
+        half = (analyzed.T @ incidence).tocsr()
+        if len(self.pair_counts):
+            pair_rows = numpy.frombuffer(self.pair_rows, dtype=numpy.int64)
+            pair_cols = numpy.frombuffer(self.pair_cols, dtype=numpy.int64)
+            half = half + scipy.sparse.csr_matrix((numpy.frombuffer(self.pair_counts, dtype=numpy.int64), (pair_rows, pair_cols)), shape=half.shape)
+        counts = (half + half.T).tocsr()
+        counts.setdiag(0)
+        counts.eliminate_zeros()
+
+        # Every analyzed file gets an entry, even if nothing survives the threshold
+        has_key = numpy.asarray(analyzed.sum(axis=0)).ravel() > 0
+        if self.analyzed_files:
+            has_key[list(self.analyzed_files)] = True
+        has_key |= numpy.diff(counts.indptr) > 0
+
+        counts.data[counts.data <= threshold] = 0
+        counts.eliminate_zeros()
+        if limit != -1:
+            counts = self.limitRows(counts, limit)
+
+        self.counts = counts
+        self.keys = [self.paths[i] for i in numpy.flatnonzero(has_key)]
+        self.key_set = set(self.keys)
+
+    def limitRows(self, counts, limit):
+        # Ties are broken by path, the same as buildDicts() - column order within a row isn't path order
+        path_ranks = numpy.empty(len(self.paths), dtype=numpy.int64)
+        path_ranks[sorted(range(len(self.paths)), key=self.paths.__getitem__)] = numpy.arange(len(self.paths))
+        keep = numpy.zeros(len(counts.data), dtype=bool)
+        for row in range(counts.shape[0]):
+            start, end = counts.indptr[row], counts.indptr[row + 1]
+            if end - start <= limit:
+                keep[start:end] = True
+            else:
+                keep[start + numpy.lexsort((path_ranks[counts.indices[start:end]], -counts.data[start:end]))[:limit]] = True
+        counts.data[~keep] = 0
+        counts.eliminate_zeros()
+        return counts
+
+    def buildDicts(self, threshold, limit):
+        relations = {}
+        start = 0
+        for end in range(1, len(self.rows) + 1):
+            if end < len(self.rows) and self.rows[end] == self.rows[start]:
+                continue
+
+            for i in range(start, end):
+                file = self.cols[i]
+                if not self.tops[i]:
+                    continue
+                relations.setdefault(file, {})
+                for j in range(start, end):
+                    related_file = self.cols[j]
+                    if related_file == file:
+                        continue
+                    relations[file][related_file] = relations[file].get(related_file, 0) + 1
+                    relations.setdefault(related_file, {})
+                    relations[related_file][file] = relations[related_file].get(file, 0) + 1
+            start = end
+
+        for file, related_file, count in zip(self.pair_rows, self.pair_cols, self.pair_counts):
+            relations.setdefault(file, {})
+            relations[file][related_file] = relations[file].get(related_file, 0) + count
+            relations.setdefault(related_file, {})
+            relations[related_file][file] = relations[related_file].get(file, 0) + count
+        for file in self.analyzed_files:
+            relations.setdefault(file, {})
+
+        for file in relations:
+            related = {k: v for (k, v) in relations[file].items() if v > threshold}
+            if limit != -1:
+                related = dict(sorted(related.items(), key=lambda item: (-item[1], self.paths[item[0]]))[:limit])
+            relations[file] = related
+
+        self.relations = relations
+        self.keys = [self.paths[i] for i in sorted(relations)]
+        self.key_set = set(self.keys)
+
+    def getEdges(self):
+        """
+            (file ids, related file ids, counts) for every kept relation - ids
+            are indexes into self.paths
+        """
+        if self.counts is not None:
+            edges = self.counts.tocoo()
+            return (edges.row, edges.col, edges.data)
+
+        edges = ([], [], [])
+        for file, related in self.relations.items():
+            for related_file, count in related.items():
+                edges[0].append(file)
+                edges[1].append(related_file)
+                edges[2].append(count)
+        return edges
+
+    def neighbors(self, path):
+        if path not in self.key_set:
+            raise KeyError(path)
+
+        file = self.ids[path]
+        if self.counts is not None:
+            start, end = self.counts.indptr[file], self.counts.indptr[file + 1]
+            return {self.paths[j]: int(v) for (j, v) in zip(self.counts.indices[start:end], self.counts.data[start:end])}
+        return {self.paths[j]: v for (j, v) in self.relations.get(file, {}).items()}
+
+    def __getitem__(self, path):
+        return self.neighbors(path)
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def toDict(self):
+        return {file: self.neighbors(file) for file in self.keys}
@@ -0,0 +1,260 @@
+# RepoExplorer: A utility to quickly familiarize oneself with a code repo.
+# Copyright (C) 2019  Jon Stockton <jonstockton1416@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import array
+import collections.abc
+import json
+import mmap
+import os
+
+STORE_VERSION = 1
+
+# Column name -> array typecode.  Commit columns have one entry per commit
+#  (offsets has one extra), file columns have one entry per changed file.
+COMMIT_COLUMNS = {"hashes": "B", "dates": "q", "authors": "i", "limited": "B", "offsets": "q"}
+FILE_COLUMNS = {"file_ids": "i", "types": "B", "adds": "i", "dels": "i", "a_paths": "i"}
+
+def columnLengths(commits, entries):
+    # Size in bytes of each column holding this many commits/changed files
+    lengths = {}
+    for column, typecode in list(COMMIT_COLUMNS.items()) + list(FILE_COLUMNS.items()):
+        if column == "hashes":
+            length = commits * 20
+        elif column == "offsets":
+            length = commits + 1
+        else:
+            length = commits if column in COMMIT_COLUMNS else entries
+        lengths[column] = length * array.array(typecode).itemsize if column != "hashes" else length
+    return lengths
+
+class ColumnStoreWriter:
+    """
+        Appends commits to an on-disk columnar store as they're collected, so the
+        commit table never has to be held in memory
+    """
+    def __init__(self, path, append=False):
+        self.path = path
+        self.authors = {}
+        self.paths = {}
+        self.commits = 0
+        self.entries = 0
+
+        # Pick up where an existing store left off
+        meta_path = os.path.join(path, "meta.json")
+        if append and os.path.isfile(meta_path):
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            self.authors = {author: i for (i, author) in enumerate(meta['authors'])}
+            self.paths = {file: i for (i, file) in enumerate(meta['paths'])}
+            self.commits = meta['commits']
+            self.entries = meta['entries']
+            mode = "r+b"
+        else:
+            # The old meta.json must go before the columns it describes are truncated
+            os.makedirs(path, exist_ok=True)
+            if os.path.isfile(meta_path):
+                os.remove(meta_path)
+            mode = "wb"
+
+        # Anything past what meta.json covers is left over from an interrupted run
+        self.columns = {}
+        for column, length in columnLengths(self.commits, self.entries).items():
+            self.columns[column] = open(os.path.join(path, column + ".bin"), mode)
+            if mode == "r+b":
+                self.columns[column].seek(length)
+
+        # offsets always starts with the first file entry's position
+        if mode == "wb":
+            self.write("offsets", [0])
+
+    def write(self, column, values):
+        typecode = COMMIT_COLUMNS.get(column) or FILE_COLUMNS.get(column)
+        array.array(typecode, values).tofile(self.columns[column])
+
+    def getId(self, table, value):
+        if value not in table:
+            table[value] = len(table)
+        return table[value]
+
+    def appendCommit(self, commit_hash, author, date, files):
+        self.columns['hashes'].write(bytes.fromhex(commit_hash))
+        self.write("dates", [date])
+        self.write("authors", [self.getId(self.authors, author)])
+        self.write("limited", [1 if files is None else 0])
+
+        if files is not None:
+            file_ids = []
+            types = []
+            adds = []
+            dels = []
+            a_paths = []
+            for file, file_info in files.items():
+                file_ids.append(self.getId(self.paths, file))
+                types.append(ord(file_info['type']))
+                adds.append(file_info['add'] if file_info['add'] is not None else -1)
+                dels.append(file_info['del'] if file_info['del'] is not None else -1)
+                a_paths.append(self.getId(self.paths, file_info['a_path']) if "a_path" in file_info else -1)
+            self.write("file_ids", file_ids)
+            self.write("types", types)
+            self.write("adds", adds)
+            self.write("dels", dels)
+            self.write("a_paths", a_paths)
+            self.entries += len(file_ids)
+
+        self.write("offsets", [self.entries])
+        self.commits += 1
+
+    def close(self, data, renames, last_commit, timestamp):
+        """
+            data - the collected data, only its "authors" and "files" counters are
+              stored (they're proportional to the number of authors/files)
+        """
+        for column in self.columns.values():
+            column.truncate()
+            column.close()
+
+        meta = {
+            "version": STORE_VERSION,
+            "commits": self.commits,
+            "entries": self.entries,
+            "authors": list(self.authors),
+            "paths": list(self.paths),
+            "author_stats": [[self.getId(self.authors, author), stats] for (author, stats) in data['authors'].items()],
+            "file_stats": [[self.getId(self.paths, file), stats] for (file, stats) in data['files'].items()],
+            "renames": renames,
+            "last_commit": last_commit,
+            "timestamp": timestamp
+        }
+
+        # Only now does the store include the new commits
+        with open(os.path.join(self.path, "meta.json.tmp"), "w") as f:
+            json.dump(meta, f)
+        os.replace(os.path.join(self.path, "meta.json.tmp"), os.path.join(self.path, "meta.json"))
+
+class CommitColumns(collections.abc.Mapping):
+    """
+        Reads like the old commits dict (hash -> commit data), decoding commits
+        from the memory mapped columns only when they're asked for
+    """
+    def __init__(self, store):
+        self.store = store
+        self.index = None
+
+    def __len__(self):
+        return self.store.commits
+
+    def hash(self, row):
+        return self.store.columns['hashes'][row * 20:(row + 1) * 20].hex()
+
+    def __iter__(self):
+        for row in range(self.store.commits):
+            yield self.hash(row)
+
+    def __reversed__(self):
+        for row in range(self.store.commits - 1, -1, -1):
+            yield self.hash(row)
+
+    def __getitem__(self, commit_hash):
+        # The first and last commits are what usually get looked up, anything else needs an index
+        if self.store.commits and commit_hash == self.hash(0):
+            return self.store.getCommit(0)
+        if self.store.commits and commit_hash == self.hash(self.store.commits - 1):
+            return self.store.getCommit(self.store.commits - 1)
+
+        if self.index is None:
+            self.index = {self.hash(row): row for row in range(self.store.commits)}
+        return self.store.getCommit(self.index[commit_hash])
+
+class ColumnStore:
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        if meta['version'] != STORE_VERSION:
+            raise Exception("Unsupported column store version: %s" % (meta['version']))
+
+        self.commits = meta['commits']
+        self.entries = meta['entries']
+        self.author_names = meta['authors']
+        self.paths = meta['paths']
+        self.renames = meta['renames']
+        self.last_commit = meta['last_commit']
+        self.timestamp = meta['timestamp']
+        self.authors = {self.author_names[author]: stats for (author, stats) in meta['author_stats']}
+        self.files = {self.paths[file]: stats for (file, stats) in meta['file_stats']}
+
+        # Only the rows covered by meta.json are mapped, anything after was never committed
+        self.maps = []
+        self.views = []
+        self.columns = {}
+        for column, length in columnLengths(self.commits, self.entries).items():
+            typecode = COMMIT_COLUMNS.get(column) or FILE_COLUMNS.get(column)
+            if length == 0:
+                self.columns[column] = memoryview(array.array(typecode))
+                continue
+
+            with open(os.path.join(path, column + ".bin"), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.maps.append(mapped)
+            view = memoryview(mapped)
+            self.views.append(view)
+            view = view[:length]
+            self.views.append(view)
+            if typecode != "B":
+                view = view.cast(typecode)
+                self.views.append(view)
+            self.columns[column] = view
+
+    def close(self):
+        # Views have to go before the maps they were made from
+        for view in reversed(self.views):
+            view.release()
+        for mapped in self.maps:
+            mapped.close()
+
+    def getData(self):
+        return {"authors": self.authors, "commits": CommitColumns(self), "files": self.files}
+
+    def getCache(self):
+        # Shaped like Explorer.getCache() so it goes through the same checks
+        return {"data": self.getData(), "renames": self.renames, "last_commit": self.last_commit, "timestamp": self.timestamp}
+
+    def getCommit(self, row):
+        files = None
+        if not self.columns['limited'][row]:
+            files = {}
+            for i in range(self.columns['offsets'][row], self.columns['offsets'][row + 1]):
+                add = self.columns['adds'][i]
+                delete = self.columns['dels'][i]
+                file_info = {"add": add if add != -1 else None, "del": delete if delete != -1 else None, "type": chr(self.columns['types'][i]), "diff": None}
+                if self.columns['a_paths'][i] != -1:
+                    file_info['a_path'] = self.paths[self.columns['a_paths'][i]]
+                files[self.paths[self.columns['file_ids'][i]]] = file_info
+
+        return {"author": self.author_names[self.columns['authors'][row]], "files": files, "date": self.columns['dates'][row]}
+
+    def iterCommitFiles(self, start=0):
+        """
+            Paths changed by each commit (None if it was over commit_file_limit),
+            without building the per-file dicts
+        """
+        offsets = self.columns['offsets']
+        file_ids = self.columns['file_ids']
+        limited = self.columns['limited']
+        for row in range(start, self.commits):
+            if limited[row]:
+                yield None
+            else:
+                yield [self.paths[file] for file in file_ids[offsets[row]:offsets[row + 1]]]
@@ -0,0 +1,99 @@
+# RepoExplorer: A utility to quickly familiarize oneself with a code repo.
+# Copyright (C) 2019  Jon Stockton <jonstockton1416@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import bisect
+
+def splitPath(path):
+    return [part for part in path.strip("/").split("/") if part]
+
+def isUnder(path, prefix):
+    # A path is under itself, an empty prefix covers everything
+    if not prefix:
+        return True
+    prefix = "/".join(splitPath(prefix))
+    return path == prefix or path.startswith(prefix + "/")
+
+class CommitIndex:
+    """
+        Finds the commits in a date range and/or touching a path prefix without
+        visiting the rest of the history
+
+        dates - commit dates (unix time) in collection order, commits are
+          referred to by their position (row) in this order
+        commit_files - the paths changed by each commit (None if it was over
+          commit_file_limit), in the same order
+        resolve - maps a historical path to its current name, so a file's
+          history is found under the name it has now
+        get_commit - returns the commit data for a row
+    """
+    def __init__(self, dates, commit_files, resolve, get_commit):
+        self.count = len(dates)
+        self.get_commit = get_commit
+
+        # Commit dates aren't necessarily in order (rebases, clock skew), so keep
+        #  the rows sorted by date alongside
+        self.order = sorted(range(self.count), key=dates.__getitem__)
+        self.sorted_dates = [dates[row] for row in self.order]
+
+        # Path components down to the rows that changed each file
+        self.trie = {}
+        for row, files in enumerate(commit_files):
+            if files is None:
+                continue
+            for file in files:
+                node = self.trie
+                for part in splitPath(resolve(file)):
+                    node = node.setdefault(part, {})
+                node.setdefault(None, []).append(row)
+
+    def getRowsInRange(self, since=None, until=None):
+        low = bisect.bisect_left(self.sorted_dates, since) if since is not None else 0
+        high = bisect.bisect_right(self.sorted_dates, until) if until is not None else self.count
+        return self.order[low:high]
+
+    def getRowsUnder(self, path):
+        node = self.trie
+        for part in splitPath(path):
+            if part not in node:
+                return set()
+            node = node[part]
+
+        rows = set()
+        nodes = [node]
+        while nodes:
+            for part, child in nodes.pop().items():
+                if part is None:
+                    rows.update(child)
+                else:
+                    nodes.append(child)
+        return rows
+
+    def getRows(self, since=None, until=None, path=None):
+        """
+            Rows of the matching commits, in collection order
+        """
+        rows = None
+        if since is not None or until is not None:
+            rows = set(self.getRowsInRange(since, until))
+        if path:
+            under = self.getRowsUnder(path)
+            rows = under if rows is None else rows & under
+
+        return range(self.count) if rows is None else sorted(rows)
+
+    def iterCommits(self, since=None, until=None, path=None, start=0):
+        for row in self.getRows(since, until, path):
+            if row >= start:
+                yield self.get_commit(row)
@@ -0,0 +1,132 @@
+# RepoExplorer: A utility to quickly familiarize oneself with a code repo.
+# Copyright (C) 2019  Jon Stockton <jonstockton1416@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import os
+import sqlite3
+import time
+
+class DiffMemo:
+    """
+        Persistent memo of diff results keyed by (old blob sha, new blob sha)
+
+        Blob hashes identify content, so a memo can be shared by every run and
+        every repo - reverts, cherry-picks and forks all hit it.  Once it grows
+        past max_bytes the least recently used entries are evicted.
+
+        Pairs that can't be diffed (binary or not UTF-8) are kept as negative
+        entries, with None counts, so they aren't read and tried again.
+    """
+    # Counts of a negative entry as stored
+    UNDIFFABLE = -1
+
+    # Write hits/new entries out every this many operations
+    FLUSH_EVERY = 256
+
+    def __init__(self, path, max_bytes):
+        self.max_bytes = max_bytes
+        self.pending_hits = {}
+        self.pending_puts = []
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS diffs (
+                a_sha TEXT NOT NULL,
+                b_sha TEXT NOT NULL,
+                adds INTEGER NOT NULL,
+                dels INTEGER NOT NULL,
+                diff TEXT,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (a_sha, b_sha)
+            ) WITHOUT ROWID""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS diffs_last_used ON diffs (last_used)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self.db.execute("INSERT OR IGNORE INTO meta VALUES ('bytes', 0)")
+        self.db.commit()
+
+    def get(self, a_sha, b_sha, with_diff=False):
+        """
+            (additions, deletions, diff) or None - entries stored without a full
+            diff don't count when one is wanted, negative entries are
+            (None, None, None)
+        """
+        row = self.db.execute("SELECT adds, dels, diff FROM diffs WHERE a_sha = ? AND b_sha = ?", (a_sha, b_sha)).fetchone()
+        if row is None:
+            return None
+        if row[0] == self.UNDIFFABLE:
+            row = (None, None, None)
+        elif with_diff and row[2] is None:
+            return None
+
+        self.pending_hits[(a_sha, b_sha)] = time.time()
+        self.maybeFlush()
+        return row
+
+    def put(self, a_sha, b_sha, additions, deletions, diff=None):
+        """
+            None additions/deletions store a negative entry
+        """
+        if additions is None or deletions is None:
+            additions = deletions = self.UNDIFFABLE
+            diff = None
+        size = 100 + (len(diff) if diff is not None else 0)
+        self.pending_puts.append((a_sha, b_sha, additions, deletions, diff, size, time.time()))
+        self.maybeFlush()
+
+    def maybeFlush(self):
+        if len(self.pending_hits) + len(self.pending_puts) >= self.FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        if not self.pending_hits and not self.pending_puts:
+            return
+
+        with self.db:
+            self.db.executemany("UPDATE diffs SET last_used = ? WHERE a_sha = ? AND b_sha = ?",
+                [(last_used, a_sha, b_sha) for ((a_sha, b_sha), last_used) in self.pending_hits.items()])
+
+            # Replacing an entry (e.g. to add its diff) mustn't count its size twice
+            for entry in self.pending_puts:
+                old = self.db.execute("SELECT size FROM diffs WHERE a_sha = ? AND b_sha = ?", entry[:2]).fetchone()
+                self.db.execute("INSERT OR REPLACE INTO diffs VALUES (?, ?, ?, ?, ?, ?, ?)", entry)
+                self.db.execute("UPDATE meta SET value = value + ? WHERE key = 'bytes'", (entry[5] - (old[0] if old else 0),))
+
+            self.evict()
+
+        self.pending_hits = {}
+        self.pending_puts = []
+
+    def evict(self):
+        total = self.db.execute("SELECT value FROM meta WHERE key = 'bytes'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Go a bit under the limit so we aren't evicting on every flush
+        target = self.max_bytes * 0.9
+        evicted = []
+        for a_sha, b_sha, size in self.db.execute("SELECT a_sha, b_sha, size FROM diffs ORDER BY last_used"):
+            if total <= target:
+                break
+            evicted.append((a_sha, b_sha))
+            total -= size
+
+        self.db.executemany("DELETE FROM diffs WHERE a_sha = ? AND b_sha = ?", evicted)
+        self.db.execute("UPDATE meta SET value = ? WHERE key = 'bytes'", (total,))
+
+    def close(self):
+        self.flush()
+        self.db.close()
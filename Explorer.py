@@ -14,31 +14,116 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import collections
 import configparser
+import datetime
 import difflib
+import io
+import itertools
+import multiprocessing
 import pathlib
 import json
+import math
 import sys
 import os
 import git
+import heapq
 import pprint
+import sqlite3
+import subprocess
+import tempfile
 import time
-import llist
-import magic
+import BlobCache
+import CacheFile
+import CoChangeMatrix
+import ColumnStore
+import CommitIndex
+import DiffMemo
+import FileScores
+import ImportGraph
+import LanguageIdentifier
+import OutputWriter
+import PathIndex
+import Profiler
+import RenameResolver
+import StreamAggregator
+
+FileChange = collections.namedtuple('FileChange', ['change_type', 'a_path', 'b_path'])
+
+# Limits an analysis to commits between two dates (unix time) and/or files under a path
+Scope = collections.namedtuple('Scope', ['since', 'until', 'path'])
+
+# Per-process state for the diff worker pool
+worker_repo = None
+worker_explorer = None
+
+def initDiffWorker(repo_dir, config_text):
+    global worker_repo, worker_explorer
+    worker_repo = git.Repo(repo_dir)
+    worker_explorer = Explorer(repo_dir)
+    worker_explorer.config = configparser.ConfigParser()
+    worker_explorer.config.read_string(config_text)
+    worker_explorer.openDiffMemo()
+
+def diffWorker(tasks):
+    results = [worker_explorer.collectCommit(worker_repo, task) for task in tasks]
+    worker_explorer.flushDiffMemo()
+    return (results, worker_explorer.profiler.takeCounters())
+
+def imapBounded(pool, func, tasks, chunk_size, window):
+    """
+        Ordered pool.imap() that only pulls more tasks from the iterator as
+        results are consumed, so a long history never gets queued all at once
+    """
+    tasks = iter(tasks)
+    pending = collections.deque()
+    while True:
+        while len(pending) < window:
+            chunk = list(itertools.islice(tasks, chunk_size))
+            if not chunk:
+                break
+            pending.append(pool.apply_async(func, (chunk,)))
+
+        if not pending:
+            return
+        yield pending.popleft().get()
 
 class Explorer:
     repo_dir = "."
     config = None
-    data = {}
+    data = None
     differ = None
-    stats = {}
-    renames = {}
+    stats = None
+    renames = None
+    last_commit = None
+    cochange = None
+    path_index = None
+    commit_index = None
+    stream = None
+    store = None
+    diff_memo = None
+    blob_cache = None
+    tree_blobs = None
+    file_types = None
+    import_graph = None
+    import_links = None
+    file_scores = None
+    output_writer = None
+    profiler = None
 
     def __init__(self, path="."):
         self.repo_dir = path
+        # Per instance, a process may explore several repos one after another
+        self.data = {}
+        self.stats = {}
         self.differ = difflib.Differ()
+        self.renames = RenameResolver.RenameResolver()
+        self.profiler = Profiler.Profiler()
 
     def setConfig(self, config_group, config, value):
+        # Config files from before a section was added won't have it
+        if not self.config.has_section(config_group):
+            self.config.add_section(config_group)
         self.config.set(config_group, config, value)
 
     def getConfig(self, config_group, config):
@@ -47,20 +132,75 @@ class Explorer:
         else:
             return False
 
+    def getConfigText(self):
+        config_text = io.StringIO()
+        self.config.write(config_text)
+        return config_text.getvalue()
+
     def loadConfigs(self, path):
         config = configparser.ConfigParser()
         config.read(path)
+        self.useConfig(config)
+
+    def loadConfigString(self, config_text):
+        # For sharing one config file (already read) between explorers
+        config = configparser.ConfigParser()
+        config.read_string(config_text)
+        self.useConfig(config)
+
+    def useConfig(self, config):
         self.config = config
 
         # We want to store the cache file in the relevant repo unless directed otherwise
         self.config.set('Caching', 'cache_file', ("%s/%s" % (self.repo_dir, self.config.get('Caching', 'cache_file'))))
 
+    def getTreeBlobs(self):
+        """
+            [(path, blob sha), ...] for every file in HEAD
+        """
+        if self.tree_blobs is None:
+            self.tree_blobs = []
+            listing = git.Repo(self.repo_dir).git.ls_tree("-r", "-z", "HEAD")
+            for entry in listing.split("\0"):
+                if not entry:
+                    continue
+                info, path = entry.split("\t", 1)
+                mode, object_type, sha = info.split()
+                # Submodules and symlinks have no content of their own
+                if object_type == "blob" and mode != "120000":
+                    self.tree_blobs.append((path, sha))
+        return self.tree_blobs
+
+    def getFileTypes(self):
+        """
+            {path: (language or file type, is_binary)} for every file in HEAD
+        """
+        if self.file_types is None:
+            threads = int(self.config.get('Language Identification', 'threads', fallback="4"))
+            identifier = LanguageIdentifier.LanguageIdentifier(self.repo_dir, self.getBlobCache(), threads)
+            self.file_types = identifier.identify(self.getTreeBlobs())
+            self.profiler.count("file_types_cached", identifier.cache_hits)
+            self.profiler.count("file_types_checked", identifier.checked)
+        return self.file_types
+
     def identifyLanguages(self):
+        languages = {}
+        dirs = {}
+
         # For each file in the repo that is not ignored
-            # Use magic to check file type
-            # Take directory, throw it in languages[file_type]['dirs']
-            # languages[file_type]['file_count'] += 1
-        pass
+        for path, (file_type, is_binary) in self.getFileTypes().items():
+            if self.doesIgnorePath(path):
+                continue
+
+            if file_type not in languages:
+                languages[file_type] = {"file_count": 0, "dirs": []}
+                dirs[file_type] = set()
+            languages[file_type]['file_count'] += 1
+            dirs[file_type].add(os.path.dirname(path) or ".")
+
+        for file_type in languages:
+            languages[file_type]['dirs'] = sorted(dirs[file_type])
+        return languages
 
     def keepFileStats(self, change, change_info):
         if "files" not in self.data:
@@ -74,12 +214,9 @@ class Explorer:
         elif change.change_type == "M":
             self.data['files'][change.b_path]['commits'] += 1
         elif change.change_type == "R":
-            # There's a chance that a_path doesn't exist in our data yet....
-            # @todo Figure out how/why that happens...
-            """
-                yii ....
-                Commits Complete: 5264 / 6581 (~79%)
-                KeyError: 'framework/vendors/markdown/License.md' """
+            # Keep track of renames - even when a_path isn't in our data (e.g. it
+            #  was only ever touched by commits over commit_file_limit)
+            self.renames.rename(change.a_path, change.b_path)
 
             if change.a_path in self.data['files']:
                 self.data['files'][change.b_path] = {}
@@ -88,14 +225,6 @@ class Explorer:
                     self.data['files'][change.b_path]['impact'] = self.data['files'][change.a_path]['impact']
                 del self.data['files'][change.a_path]
 
-                # Keep track of renames
-                # @todo This should be done outside of data collection so we can work with the cache
-                if change.a_path not in self.renames:
-                    self.renames[change.a_path] = llist.sllist([change.a_path, change.b_path])
-                else:
-                    self.renames[change.a_path].append(change.b_path)
-                self.renames[change.b_path] = self.renames[change.a_path]
-
             elif change.b_path in self.data['files']:
                 self.data['files'][change.b_path]['commits'] += 1
             else:
@@ -109,11 +238,13 @@ class Explorer:
                 self.data['files'][change.b_path]['impact'] = 0
             self.data['files'][change.b_path]['impact'] += change_info['add'] + change_info['del']
 
-    def doesIgnorePath(self, path):
-        # Ignore particular extensions
+    def getLivePaths(self):
+        # One listing of the HEAD tree instead of checking the filesystem path by path
+        listing = git.Repo(self.repo_dir).git.ls_tree("-r", "-z", "--name-only", "HEAD")
+        return set(path for path in listing.split("\0") if path)
+
+    def buildPathIndex(self):
         ignored_extensions = self.config.get('Dependency Inference', 'ignore_extensions').split(",")
-        if path.endswith(tuple(ignored_extensions)):
-            return True
 
         # Ignore structures
         ignored_dirs = []
@@ -123,11 +254,17 @@ class Explorer:
                 + self.stats['structures']['references'] \
                 + self.stats['structures']['configs']
 
-        for dir in ignored_dirs:
-            if not os.path.relpath(path, dir).startswith(".."):
-                return True
+        ignored_paths = []
+        if self.config.getboolean('Dependency Inference', 'ignore_binaries'):
+            ignored_paths = [path for (path, (file_type, is_binary)) in self.getFileTypes().items() if is_binary]
 
-        return False
+        self.path_index = PathIndex.PathIndex(ignored_extensions, ignored_dirs, self.getLivePaths(), self.resolveRename, ignored_paths)
+        return self.path_index
+
+    def doesIgnorePath(self, path):
+        if self.path_index is None:
+            self.buildPathIndex()
+        return self.path_index.isIgnored(path)
 
     def collectData(self, from_cache=False):
         """
@@ -136,232 +273,1024 @@ class Explorer:
               "impact" (based on changeset)
             For each file - identify file type and the current content
         """
-        data = {}
+        data = None
+        last_commit = None
         cache_path = pathlib.Path(self.config.get('Caching', 'cache_file'))
-        if from_cache and cache_path.is_file():
+        store_path = pathlib.Path(self.getStorePath())
+        incremental = self.config.getboolean('Caching', 'incremental', fallback=False)
+        if from_cache and self.usesStreaming():
+            print("\tStreaming mode doesn't keep a cache...")
+        elif from_cache and self.usesColumnStore() and (store_path / "meta.json").is_file():
+            # The column store is its own cache
+            print("\tLoading from column store (%s)..." % (store_path))
+            try:
+                with self.profiler.phase("cache read"):
+                    self.store = ColumnStore.ColumnStore(store_path)
+                    data, self.renames, last_commit = self.loadCache(self.store.getCache(), force=incremental)
+            except:
+                # @todo Do something with the error
+                print(sys.exc_info()[0])
+                data = None
+        elif from_cache and cache_path.is_file():
             print("\tLoading from cache (%s)..." % (cache_path))
             try:
-                with open(cache_path, "r") as f:
-                    json_data = json.load(f)
-                    data, self.renames = self.loadCache(json_data)
+                # An expired cache is still a fine starting point if we're going to refresh it
+                with self.profiler.phase("cache read"):
+                    data, self.renames, last_commit = self.loadCache(CacheFile.readCache(cache_path), force=incremental)
             except:
                 # @todo Do something with the error
                 print(sys.exc_info()[0])
-        else:
+                data = None
+
+        if data is not None and incremental:
+            if last_commit is not None and self.isKnownCommit(last_commit):
+                print("\tRefreshing cache from commit %s..." % (last_commit))
+                data = self.loadLiveData(data, last_commit)
+            else:
+                # History was rewritten (or the cache predates tip tracking), start over
+                print("\tCached commit %s is no longer in the history, rebuilding..." % (last_commit))
+                data = None
+
+        if data is None:
             print("\tLoading live data...")
+            self.renames = RenameResolver.RenameResolver()
             data = self.loadLiveData()
 
-            # @todo Make this not needed....
-            data['files'] = self.data['files']
-
         self.data = data
+        self.saveCache()
+
+    def refreshData(self):
+        """
+            Bring collected data up to date with HEAD, only processing the
+            commits made since - returns whether there was anything new
+        """
+        head = git.Repo(self.repo_dir).head.commit.hexsha
+        if self.last_commit == head:
+            return False
+
+        if self.last_commit is not None and self.isKnownCommit(self.last_commit):
+            print("\tRefreshing from commit %s..." % (self.last_commit))
+            self.loadLiveData(self.data, self.last_commit)
+        else:
+            print("\tCommit %s is no longer in the history, rebuilding..." % (self.last_commit))
+            self.renames = RenameResolver.RenameResolver()
+            self.loadLiveData()
+
+        self.saveCache()
+        return True
 
-        if self.config.getboolean('General', 'enable_cache'):
+    def saveCache(self):
+        # The column store is written as data is collected, streaming keeps nothing to cache
+        if self.config.getboolean('General', 'enable_cache') and not self.usesColumnStore() and not self.usesStreaming():
+            cache_path = self.config.get('Caching', 'cache_file')
             print("\tWriting cache file '%s'..." % (cache_path))
-            with open(cache_path, "w") as f:
-                f.write(json.dumps(self.getCache()))
+            with self.profiler.phase("cache write"):
+                CacheFile.writeCache(cache_path, self.getCache())
 
-    def getDiffStats(self, commit, last_commit):
-        files = {}
+    def usesColumnStore(self):
+        return self.config.get('Data Collection', 'store', fallback="memory") == "columnar"
+
+    def usesStreaming(self):
+        return self.config.get('Data Collection', 'store', fallback="memory") == "streaming"
+
+    def collectsImpactLazily(self):
+        # Only the gitpython backend reads blobs itself, and only the memory store keeps the commits to go back to
+        return self.config.getboolean('Data Collection', 'impact_stats') \
+          and self.config.getboolean('Data Collection', 'lazy_impact', fallback=False) \
+          and self.config.get('Data Collection', 'backend', fallback="gitpython") == "gitpython" \
+          and self.config.get('Data Collection', 'store', fallback="memory") == "memory"
+
+    def getStorePath(self):
+        return self.config.get('Data Collection', 'store_path', fallback="%s.columns" % (self.config.get('Caching', 'cache_file')))
+
+    def isKnownCommit(self, commit):
+        repo = git.Repo(self.repo_dir)
+        try:
+            return repo.is_ancestor(repo.commit(commit), repo.head.commit)
+        except (ValueError, git.GitCommandError):
+            return False
+
+    def openDiffMemo(self):
+        """
+            Open the diff memo (if there is one) ahead of diffing - a memo that
+            can't be opened is warned about once and done without, rather than
+            failing every diff
+        """
+        if self.diff_memo is not None:
+            return
+        memo_path = self.config.get('Caching', 'diff_memo', fallback="")
+        if not memo_path:
+            return
+        max_bytes = int(self.config.get('Caching', 'diff_memo_size', fallback="256")) * 1024 * 1024
+        try:
+            self.diff_memo = DiffMemo.DiffMemo(os.path.expanduser(memo_path), max_bytes)
+        except (OSError, sqlite3.Error) as error:
+            print("\t\tCan't open the diff memo (%s), diffing without it: %s" % (memo_path, error))
+            self.diff_memo = False
+
+    def getDiffMemo(self):
+        return self.diff_memo or None
+
+    def getBlobCache(self):
+        if self.blob_cache is None:
+            cache_path = self.config.get('Caching', 'blob_cache', fallback="")
+            if not cache_path:
+                return None
+            self.blob_cache = BlobCache.BlobCache(os.path.expanduser(cache_path))
+        return self.blob_cache
+
+    def flushDiffMemo(self):
+        if self.diff_memo:
+            self.diff_memo.flush()
+
+    def diffBlobs(self, a_blob, b_blob):
+        full_diff = self.config.getboolean('Data Collection', 'full_diff')
+
+        # The same pair of blobs always diffs the same way, whatever commit/repo they're in
+        memo = self.getDiffMemo()
+        if memo is not None:
+            memoized = memo.get(a_blob.hexsha, b_blob.hexsha, full_diff)
+            if memoized is not None:
+                self.profiler.count("diff_memo_hits")
+                return (memoized[0], memoized[1], memoized[2] if full_diff else None)
+
+        try:
+            orig = a_blob.data_stream.read()
+            new = b_blob.data_stream.read()
+            self.profiler.count("bytes_read", len(orig) + len(new))
+            orig = orig.decode('utf-8').splitlines(1)
+            new = new.decode('utf-8').splitlines(1)
+            diffed = list(self.differ.compare(orig, new))
+        except Exception:
+            # Failing again next time would mean reading both blobs again
+            if memo is not None:
+                memo.put(a_blob.hexsha, b_blob.hexsha, None, None)
+            raise
+        self.profiler.count("blobs_diffed")
+
+        additions = 0
+        deletions = 0
+        for diff in diffed:
+            if diff.startswith('+'):
+                additions += 1
+            elif diff.startswith('-'):
+                deletions += 1
+
+        full = "\n".join(diffed) if full_diff else None
+        if memo is not None:
+            memo.put(a_blob.hexsha, b_blob.hexsha, additions, deletions, full)
+        return (additions, deletions, full)
+
+    def diffCommit(self, commit, parent):
+        changes = []
         commit_file_limit = int(self.config.get('Data Collection', 'commit_file_limit'))
-        commit_diff = last_commit.diff(commit) if last_commit != git.NULL_TREE else commit.diff(last_commit)
+        commit_diff = parent.diff(commit) if parent != git.NULL_TREE else commit.diff(parent)
 
         if commit_file_limit != -1 and len(commit_diff) > commit_file_limit:
+            self.profiler.count("commits_over_limit")
             return None
 
+        lazy_impact = self.collectsImpactLazily()
         for change in commit_diff:
-            files[change.b_path] = {"add": None, "del": None, "type": "A", "diff": None}
-            files[change.b_path]['type'] = change.change_type
+            change_info = {"add": None, "del": None, "type": "A", "diff": None}
+            change_info['type'] = change.change_type
 
             if self.config.getboolean('Data Collection', 'impact_stats'):
-                try:
-                    # Probably want to maintain previous path info too...
-                    files[change.b_path]['add'] = 0
-                    files[change.b_path]['del'] = 0
-                    files[change.b_path]['a_path'] = change.a_path
+                # Probably want to maintain previous path info too...
+                change_info['a_path'] = change.a_path
+
+                # Left for fillImpact() to work out for just the files that need it
+                if not lazy_impact:
+                    self.diffChange(change, change_info)
+
+            # Only keep what keepFileStats() needs so this can be shipped between processes
+            changes.append((FileChange(change.change_type, change.a_path, change.b_path), change_info))
+
+        return changes
+
+    def diffChange(self, change, change_info):
+        try:
+            change_info['add'] = 0
+            change_info['del'] = 0
+            additions, deletions, diff = self.diffBlobs(change.a_blob, change.b_blob)
+        except:
+            # @todo Do something with the error
+            self.profiler.count("diff_exceptions")
+            return
+
+        # A memoized failure is counted (and left at 0) the same as a new one
+        if additions is None:
+            self.profiler.count("diff_exceptions")
+            return
+        change_info['add'], change_info['del'], change_info['diff'] = (additions, deletions, diff)
+
+    def applyDiffStats(self, changes):
+        if changes is None:
+            return None
+
+        files = {}
+        for change, change_info in changes:
+            files[change.b_path] = change_info
+            self.keepFileStats(change, change_info)
 
-                    orig = change.a_blob.data_stream.read().decode('utf-8').splitlines(1)
-                    new = change.b_blob.data_stream.read().decode('utf-8').splitlines(1)
-                    diffed = list(self.differ.compare(orig, new))
+        return files
 
-                    for diff in diffed:
-                        if diff.startswith('+'):
-                            files[change.b_path]['add'] += 1
-                        elif diff.startswith('-'):
-                            files[change.b_path]['del'] += 1
+    def getDiffStats(self, commit, parent):
+        return self.applyDiffStats(self.diffCommit(commit, parent))
+
+    def collectCommit(self, repo, task):
+        commit, parent, skip = task
+        if skip:
+            return (commit, None)
+
+        commit = repo.commit(commit)
+        parent = repo.commit(parent) if parent is not None else git.NULL_TREE
+        return (str(commit), (commit.author.name, commit.committed_date, self.diffCommit(commit, parent)))
+
+    def usesFirstParent(self):
+        return self.config.getboolean('Data Collection', 'first_parent', fallback=False)
+
+    def diffsMerges(self):
+        return self.config.get('Data Collection', 'merges', fallback="skip") == "first_parent"
+
+    def countCommits(self, rev=None):
+        options = ["--first-parent"] if self.usesFirstParent() else []
+        return int(git.Repo(self.repo_dir).git.rev_list("--count", *options, rev or "HEAD"))
+
+    def iterRevisions(self, rev=None):
+        # Only hashes come through the pipe, commit objects are loaded when they're diffed
+        command = ["git", "rev-list", "--reverse", "--parents"]
+        if self.usesFirstParent():
+            command.append("--first-parent")
+        command.append(rev or "HEAD")
+        process, errors = self.startGit(command)
+        finished = False
+        try:
+            for line in process.stdout:
+                commit, *parents = line.decode('ascii').split()
+                yield (commit, parents)
+            finished = True
+        finally:
+            self.finishGit(process, errors, finished)
+
+    def startGit(self, command):
+        # stderr goes to a file so a chatty git can't block on it while we read stdout
+        errors = tempfile.TemporaryFile()
+        return (subprocess.Popen(command, cwd=self.repo_dir, stdout=subprocess.PIPE, stderr=errors), errors)
+
+    def finishGit(self, process, errors, finished):
+        """
+            finished - whether all of the output was read, otherwise git is
+            stopped and its exit status doesn't matter
+        """
+        process.stdout.close()
+        if not finished:
+            process.kill()
+        status = process.wait()
+        with errors:
+            if finished and status != 0:
+                errors.seek(0)
+                raise git.GitCommandError(process.args, status, errors.read().decode('utf-8', 'replace'))
+
+    def iterCommitTasks(self, revisions):
+        # Each commit is diffed against its first parent, whatever came before it in the listing
+        diff_merges = self.diffsMerges()
+        for commit, parents in revisions:
+            is_merge = len(parents) > 1
+            yield (commit, parents[0] if parents else None, is_merge and not diff_merges)
+
+    def parseLogCommit(self, record):
+        header, _, body = record.partition(b"\n")
+        commit, parents, author, date = [field.decode('utf-8', 'replace') for field in header.split(b"\0")[:4]]
+        if len(parents.split()) > 1 and not self.diffsMerges():
+            return (commit, None)
+
+        # --raw entries come first (status and paths), then --numstat entries in the same order
+        tokens = body.lstrip(b"\n").split(b"\0")
+        changes = []
+        counts = []
+        i = 0
+        while i < len(tokens):
+            token = tokens[i].decode('utf-8', 'replace')
+            i += 1
+            if token.startswith(":"):
+                change_type = token.split()[-1][0]
+                a_path = b_path = tokens[i].decode('utf-8', 'replace')
+                i += 1
+                if change_type in ("R", "C"):
+                    b_path = tokens[i].decode('utf-8', 'replace')
+                    i += 1
+                changes.append(FileChange(change_type, a_path, b_path))
+            elif "\t" in token:
+                add, delete, path = token.split("\t", 2)
+                if not path:
+                    # Renames put both paths in the following tokens
+                    i += 2
+                # Binary files don't have line counts
+                counts.append((int(add) if add != "-" else 0, int(delete) if delete != "-" else 0))
 
-                    if self.config.getboolean('Data Collection', 'full_diff'):
-                        files[change.b_path]['diff'] = "\n".join(diffed)
+        commit_file_limit = int(self.config.get('Data Collection', 'commit_file_limit'))
+        if commit_file_limit != -1 and len(changes) > commit_file_limit:
+            self.profiler.count("commits_over_limit")
+            return (commit, (author, int(date), None))
+
+        impact_stats = self.config.getboolean('Data Collection', 'impact_stats')
+        file_changes = []
+        for index, change in enumerate(changes):
+            change_info = {"add": None, "del": None, "type": change.change_type, "diff": None}
+            if impact_stats:
+                change_info['add'], change_info['del'] = counts[index] if index < len(counts) else (0, 0)
+                change_info['a_path'] = change.a_path
+            file_changes.append((change, change_info))
+
+        return (commit, (author, int(date), file_changes))
+
+    def iterLogCommits(self, rev=None):
+        """
+            Stream the history through a single git log process rather than
+            diffing blobs ourselves - git's own rename detection and line counts
+            are used, full diffs aren't available this way
+        """
+        command = ["git", "log", "--reverse", "--root", "--raw", "-M", "-z", "--format=%x01%H%x00%P%x00%an%x00%ct"]
+        if self.config.getboolean('Data Collection', 'impact_stats'):
+            command.append("--numstat")
+        if self.usesFirstParent():
+            command.append("--first-parent")
+        if self.diffsMerges():
+            command.append("--diff-merges=first-parent")
+        if rev is not None:
+            command.append(rev)
+
+        process, errors = self.startGit(command)
+        finished = False
+        try:
+            buffered = b""
+            for chunk in iter(lambda: process.stdout.read(65536), b""):
+                records = (buffered + chunk).split(b"\x01")
+                buffered = records.pop()
+                for record in records:
+                    if record:
+                        yield self.parseLogCommit(record)
+
+            finished = True
+        finally:
+            self.finishGit(process, errors, finished)
+
+        # Only once git's known to have finished properly, the last record could be cut short otherwise
+        if buffered:
+            yield self.parseLogCommit(buffered)
+
+    def loadLiveData(self, data=None, last_commit=None):
+        repo = git.Repo(self.repo_dir)
 
-                except:
-                    # @todo Do something with the error
-                    pass
+        # Resuming from a cache - only the commits after the cached tip need processing
+        if data is None:
+            data = {"authors": {}, "commits": {}, "files": {}}
+            rev = None
+        else:
+            rev = "%s..HEAD" % (last_commit)
 
-            self.keepFileStats(change, files[change.b_path])
+        # keepFileStats() works against self.data, so it has to be what we're building
+        self.data = data
+        self.commit_index = None
+
+        # Commits are only fed through the aggregator, which carries on from where it was if resuming
+        if self.usesStreaming() and (rev is None or self.stream is None):
+            self.stream = StreamAggregator.StreamAggregator()
+        elif not self.usesStreaming():
+            self.stream = None
+
+        # Commits go straight to disk rather than into data['commits']
+        store_writer = None
+        if self.usesColumnStore():
+            if self.store is not None:
+                self.store.close()
+                self.store = None
+            store_writer = ColumnStore.ColumnStoreWriter(self.getStorePath(), append=rev is not None)
+
+        with self.profiler.phase("enumerate"):
+            total_commits = self.countCommits(rev)
+
+        # Opened up front, so a memo that can't be used is only found out about once
+        self.openDiffMemo()
+
+        # Diffs don't depend on each other so they can be farmed out, everything else
+        #  has to be applied in commit order
+        tasks = self.iterCommitTasks(self.iterRevisions(rev))
+        backend = self.config.get('Data Collection', 'backend', fallback="gitpython")
+        jobs = int(self.config.get('Data Collection', 'jobs', fallback="1"))
+        pool = None
+        if backend == "numstat":
+            print("\t\tStreaming changes from git log...")
+            results = self.iterLogCommits(rev)
+        elif jobs > 1:
+            print("\t\tDiffing with %d worker processes..." % (jobs))
+            pool = multiprocessing.Pool(jobs, initializer=initDiffWorker, initargs=(self.repo_dir, self.getConfigText()))
+            results = self.iterWorkerResults(imapBounded(pool, diffWorker, tasks, 8, jobs * 4))
+        else:
+            results = (self.collectCommit(repo, task) for task in tasks)
 
-        return files
+        try:
+            with self.profiler.phase("collect"):
+                self.collectResults(results, data, store_writer, total_commits)
+        finally:
+            if pool is not None:
+                pool.terminate()
+
+        if self.collectsImpactLazily():
+            with self.profiler.phase("impact"):
+                self.fillImpact(data)
+
+        self.flushDiffMemo()
+
+        if store_writer is not None:
+            store_writer.close(data, self.renames.serialize(), self.last_commit, int(time.time()))
+            self.store = ColumnStore.ColumnStore(self.getStorePath())
+            data['commits'] = self.store.getData()['commits']
+
+        return data
+
+    def getImpactNeeds(self, data):
+        """
+            Which changes the enabled analyses show the impact of, as
+            {commit hash: set of paths or None for all of them} - None when
+            everything is needed anyway
+        """
+        # Scores are worked out from the churn of every change
+        ranks_by_impact = (self.config.getboolean('General', 'most_changed') and self.config.get('Most Changed', 'type') in ("impact", "downstream", "fragility")) \
+          or self.config.getboolean('General', 'scoring', fallback=False) \
+          or (self.config.getboolean('General', 'top_contributor') and self.config.get('Top Contributor', 'type') == "impact")
+        if ranks_by_impact or self.config.getboolean('Data Collection', 'full_diff'):
+            return None
+
+        # The basic info lists the first and last commits in full
+        needs = {}
+        for commit_hash in (next(iter(data['commits']), None), next(reversed(data['commits']), None)):
+            if commit_hash is not None:
+                needs[commit_hash] = None
+
+        # The same lists explore() shows - scoped ones only count the changes in the scope
+        scope = self.getScope() if not self.usesStreaming() else None
+        def needChanges(commit_hash, files):
+            if files and needs.get(commit_hash, set()) is not None:
+                needs.setdefault(commit_hash, set()).update(files)
+
+        if self.config.getboolean('General', 'most_changed') and scope is not None:
+            if int(self.config.get('Most Changed', 'limit')) < 0:
+                return None
+
+            paths = set(file for (file, file_stats) in self.findMostChanged(scope))
+            for commit_hash, commit in self.iterScopedCommitItems(data, scope):
+                needChanges(commit_hash, [file for file in commit['files'] if self.resolveRename(file) in paths])
+
+        elif self.config.getboolean('General', 'most_changed'):
+            if int(self.config.get('Most Changed', 'limit')) < 0:
+                return None
+
+            # Follow each listed file back through its renames to where it was (last) added,
+            #  which is as far back as keepFileStats() counts its impact
+            paths = set(file for (file, file_stats) in self.findMostChanged())
+            for commit_hash in reversed(data['commits']):
+                files = data['commits'][commit_hash]['files']
+                if not paths:
+                    break
+                if files is None:
+                    continue
 
-    def loadLiveData(self):
+                for file, file_info in files.items():
+                    if file not in paths or file_info['type'] == "D":
+                        continue
+                    needChanges(commit_hash, [file])
+                    if file_info['type'] in ("A", "R"):
+                        paths.discard(file)
+                    if file_info['type'] == "R":
+                        paths.add(file_info['a_path'])
+
+        if self.config.getboolean('General', 'top_contributor'):
+            if int(self.config.get('Top Contributor', 'limit')) < 0:
+                return None
+
+            # Listed authors have the impact of every change they made (in the scope)
+            authors = set(author for (author, author_stats) in self.findTopContributor(scope))
+            if scope is None:
+                commits = ((commit_hash, commit) for (commit_hash, commit) in data['commits'].items() if commit['files'] is not None)
+            else:
+                commits = self.iterScopedCommitItems(data, scope)
+            for commit_hash, commit in commits:
+                if commit['author'] not in authors:
+                    continue
+                if scope is None or not scope.path:
+                    needs[commit_hash] = None
+                else:
+                    needChanges(commit_hash, [file for file in commit['files'] if CommitIndex.isUnder(self.resolveRename(file), scope.path)])
+
+        return needs
+
+    def iterScopedCommitItems(self, data, scope):
+        # (hash, commit) of the commits in the scope's date range that have changes - path is left to the caller
+        for commit_hash, commit in data['commits'].items():
+            if commit['files'] is None:
+                continue
+            if (scope.since is not None and commit['date'] < scope.since) or (scope.until is not None and commit['date'] > scope.until):
+                continue
+            yield (commit_hash, commit)
+
+    def fillImpact(self, data):
+        """
+            Second pass of a lazy collection - diff the blobs of just the
+            changes getImpactNeeds() asks for, then recount the stats with them
+        """
         repo = git.Repo(self.repo_dir)
+        needs = self.getImpactNeeds(data)
+        print("\t\tWorking out impact for %s..." % ("every change" if needs is None else "%d commits" % (len(needs))))
+
+        for commit_hash, commit in data['commits'].items():
+            if commit['files'] is None:
+                continue
+            if needs is not None and commit_hash not in needs:
+                continue
+
+            # Changes loaded from a cache may already have it
+            paths = commit['files'].keys() if needs is None or needs[commit_hash] is None else needs[commit_hash]
+            paths = set(path for path in paths if commit['files'][path]['add'] is None)
+            if not paths:
+                continue
+            self.profiler.count("impact_commits")
+
+            # Renames are only spotted if both sides are in the pathspec
+            pathspec = None
+            if len(paths) < len(commit['files']):
+                pathspec = set(paths)
+                pathspec.update(commit['files'][path]['a_path'] for path in paths)
+                pathspec = [":(literal)%s" % (path) for path in pathspec]
+
+            # Diffed against the same first parent as in the first pass
+            git_commit = repo.commit(commit_hash)
+            if git_commit.parents:
+                commit_diff = git_commit.parents[0].diff(git_commit, paths=pathspec)
+            else:
+                commit_diff = git_commit.diff(git.NULL_TREE, paths=pathspec)
+
+            for change in commit_diff:
+                if change.b_path in paths:
+                    self.diffChange(change, commit['files'][change.b_path])
 
-        data = {"authors": {}, "commits": {}, "files": {}}
-        commits = {}
-        last_commit = git.NULL_TREE
-        total_commits = len(list(repo.iter_commits()))
+        self.recountStats(data)
+
+    def recountStats(self, data):
+        """
+            Rebuild the file and author stats from the commit table
+        """
+        self.data = data
+        data['files'] = {}
+        data['authors'] = {}
+        self.renames = RenameResolver.RenameResolver()
+        impact_stats = self.config.getboolean('Data Collection', 'impact_stats')
+
+        for commit in data['commits'].values():
+            if commit['author'] not in data['authors']:
+                data['authors'][commit['author']] = {"commits": 0}
+            author_stats = data['authors'][commit['author']]
+            author_stats['commits'] += 1
+            if impact_stats and "impact" not in author_stats:
+                author_stats['impact'] = 0
+
+            if commit['files'] is None:
+                continue
+            for file, file_info in commit['files'].items():
+                self.keepFileStats(FileChange(file_info['type'], file_info.get('a_path', file), file), file_info)
+                if impact_stats and file_info['add'] is not None and file_info['del'] is not None:
+                    author_stats['impact'] += file_info['add'] + file_info['del']
+
+    def iterWorkerResults(self, chunks):
+        for results, counters in chunks:
+            self.profiler.mergeCounters(counters)
+            for result in results:
+                yield result
+
+    def collectResults(self, results, data, store_writer, total_commits):
+        commits = data['commits']
         complete_update = int(total_commits / 10) or 1
         commits_completed = 0
         a_time = time.time()
 
-        for commit in list(repo.iter_commits())[::-1]:
+        for result in results:
             # Progress updates every ~10%
             if not commits_completed % complete_update:
                 print("\t\tCommits Complete: %d / %d (~%d%%)" % (commits_completed, total_commits, (commits_completed/total_commits*100)))
             commits_completed += 1
 
+            commit, commit_info = result
+            self.last_commit = commit
+
             # Ignore merge commits (commits with > 1 parent)
-            if len(commit.parents) > 1:
+            if commit_info is None:
+                self.profiler.count("merges_skipped")
                 continue
 
-            # Basic information
-            tmp_commit_data = {
-                "author": commit.author.name,
-                "files": {},
-                "date": commit.committed_date
-            }
-            tmp_commit_data['files'] = self.getDiffStats(commit, last_commit)
-            commits[str(commit)] = tmp_commit_data
-            last_commit = commit
-            if commit.author.name not in data['authors']:
-                data['authors'][commit.author.name] = {"commits": 0}
-            data['authors'][commit.author.name]['commits'] += 1
-            if self.config.getboolean('Data Collection', 'impact_stats'):
-                if "impact" not in data['authors'][commit.author.name]:
-                    data['authors'][commit.author.name]['impact'] = 0
+            author, date, changes = commit_info
+            self.profiler.count("commits")
+
+            with self.profiler.phase("keepFileStats"):
+                # Basic information
+                tmp_commit_data = {
+                    "author": author,
+                    "files": {},
+                    "date": date
+                }
+                tmp_commit_data['files'] = self.applyDiffStats(changes)
+                if store_writer is not None:
+                    store_writer.appendCommit(commit, author, date, tmp_commit_data['files'])
+                elif self.stream is not None:
+                    self.stream.addCommit(commit, tmp_commit_data)
+                else:
+                    commits[commit] = tmp_commit_data
+                if author not in data['authors']:
+                    data['authors'][author] = {"commits": 0}
+                data['authors'][author]['commits'] += 1
+                if self.config.getboolean('Data Collection', 'impact_stats'):
+                    if "impact" not in data['authors'][author]:
+                        data['authors'][author]['impact'] = 0
 
-                if tmp_commit_data['files'] is not None:
-                    for file in tmp_commit_data['files']:
-                        data['authors'][commit.author.name]['impact'] += tmp_commit_data['files'][file]['add'] + tmp_commit_data['files'][file]['del']
+                    if tmp_commit_data['files'] is not None:
+                        for file in tmp_commit_data['files']:
+                            if tmp_commit_data['files'][file]['add'] is not None and tmp_commit_data['files'][file]['del'] is not None:
+                                data['authors'][author]['impact'] += tmp_commit_data['files'][file]['add'] + tmp_commit_data['files'][file]['del']
 
 
             if time.time() - a_time > 60:
                 print("\t\tMinutely Update: Commits Complete: %d / %d (~%d%%)" % (commits_completed, total_commits, (commits_completed/total_commits*100)))
                 a_time = time.time()
 
-        data['commits'] = commits
-
-        return data
-
     def explore(self):
-        self.stats['basic'] = self.aggregateBasicInfo()
+        # Structures (and renames) may have changed since the last run
+        self.path_index = None
+        self.commit_index = None
+        self.tree_blobs = None
+        self.file_types = None
+        self.import_graph = None
+        self.import_links = None
+        self.file_scores = None
+        scope = self.getScope()
+        if scope is not None and self.stream is not None:
+            print("\tScoped analysis needs the commit table, which streaming mode doesn't keep - ignoring the scope...")
+            scope = None
+
+        with self.profiler.phase("explore: basic"):
+            self.stats['basic'] = self.aggregateBasicInfo()
+            self.emitPhase('basic')
+
+        if scope is not None:
+            self.stats['scope'] = scope._asdict()
+            self.emitPhase('scope')
 
         if self.config.getboolean('General', 'structure_location'):
             print("\tFinding structures...")
-            self.stats['structures'] = self.findStructures()
+            with self.profiler.phase("explore: structures"):
+                self.stats['structures'] = self.findStructures()
+                self.emitPhase('structures')
+
+        if self.config.getboolean('General', 'language_id'):
+            print("\tIdentifying languages...")
+            with self.profiler.phase("explore: languages"):
+                self.stats['languages'] = self.identifyLanguages()
+                self.emitPhase('languages')
 
         if self.config.getboolean('General', 'most_changed'):
             print("\tFinding most changed file(s)...")
-            self.stats['most_changed'] = self.findMostChanged()
+            with self.profiler.phase("explore: most_changed"):
+                self.stats['most_changed'] = self.findMostChanged(scope)
+                self.emitPhase('most_changed')
 
         if self.config.getboolean('General', 'top_contributor'):
             print("\tFinding top contributor(s)...")
-            self.stats['top_contributor'] = self.findTopContributor()
+            with self.profiler.phase("explore: top_contributor"):
+                self.stats['top_contributor'] = self.findTopContributor(scope)
+                self.emitPhase('top_contributor')
 
         if self.config.getboolean('General', 'dependency_inference'):
             print("\tInferring dependencies...")
-            self.stats['dependencies'] = self.inferDependencies()
+            with self.profiler.phase("explore: dependencies"):
+                if self.output_writer is not None:
+                    # Written out a file at a time rather than kept
+                    self.stats.pop('dependencies', None)
+                    self.output_writer.writeRecords('dependencies', self.iterDependencies(scope))
+                else:
+                    self.stats['dependencies'] = self.inferDependencies(scope)
+
+        if self.config.getboolean('General', 'scoring', fallback=False):
+            print("\tScoring files...")
+            with self.profiler.phase("explore: scores"):
+                self.stats['scores'] = self.findTopScores()
+                self.emitPhase('scores')
+
+    def emitPhase(self, phase):
+        if self.output_writer is not None:
+            self.output_writer.writePhase(phase, self.stats[phase])
+
+    def parseScopeDate(self, value, end_of_day=False):
+        """
+            Unix time, YYYY-MM-DD[THH:MM:SS] or a number of days back (e.g. 90d)
+            end_of_day - a bare date is the end of that day rather than its start
+              (for the inclusive upper bound)
+        """
+        if not value:
+            return None
+        if value.isdigit():
+            return int(value)
+        if value.endswith("d") and value[:-1].isdigit():
+            return int(time.time()) - int(value[:-1]) * 86400
+        try:
+            day = datetime.date.fromisoformat(value)
+        except ValueError:
+            return int(datetime.datetime.fromisoformat(value).timestamp())
+        return int(datetime.datetime.combine(day, datetime.time(23, 59, 59) if end_of_day else datetime.time()).timestamp())
+
+    def makeScope(self, since=None, until=None, path=None):
+        if not since and not until and not path:
+            return None
+        return Scope(self.parseScopeDate(since), self.parseScopeDate(until, end_of_day=True), path or None)
+
+    def getScope(self):
+        return self.makeScope(self.config.get('Scope', 'since', fallback=""), self.config.get('Scope', 'until', fallback=""),
+            self.config.get('Scope', 'path', fallback=""))
+
+    def getCommitIndex(self):
+        if self.stream is not None:
+            raise ValueError("Scoped analysis isn't available in streaming mode")
+        if self.commit_index is None:
+            commits = self.data['commits']
+            if isinstance(commits, ColumnStore.CommitColumns):
+                dates = commits.store.columns['dates']
+                get_commit = commits.store.getCommit
+            else:
+                rows = list(commits.values())
+                dates = [commit['date'] for commit in rows]
+                get_commit = rows.__getitem__
+            self.commit_index = CommitIndex.CommitIndex(dates, self.iterCommitFiles(), self.resolveRename, get_commit)
+        return self.commit_index
+
+    def iterScopedCommits(self, scope, start=0):
+        return self.getCommitIndex().iterCommits(scope.since, scope.until, scope.path, start)
+
+    def getScopedFileStats(self, scope):
+        files = {}
+        for commit in self.iterScopedCommits(scope):
+            for file, file_info in (commit['files'] or {}).items():
+                # Deleted files are only listed if they're still around
+                file = self.resolveRename(file)
+                if file not in self.data['files'] or not CommitIndex.isUnder(file, scope.path):
+                    continue
+
+                if file not in files:
+                    files[file] = {"commits": 0}
+                files[file]['commits'] += 1
+                if file_info['add'] is not None and file_info['del'] is not None:
+                    files[file]['impact'] = files[file].get('impact', 0) + file_info['add'] + file_info['del']
+        return files
 
-    def findMostChanged(self):
+    def getScopedAuthorStats(self, scope):
+        impact_stats = self.config.getboolean('Data Collection', 'impact_stats')
+        authors = {}
+        for commit in self.iterScopedCommits(scope):
+            if commit['author'] not in authors:
+                authors[commit['author']] = {"commits": 0}
+            author_stats = authors[commit['author']]
+            author_stats['commits'] += 1
+
+            if impact_stats:
+                author_stats['impact'] = author_stats.get('impact', 0)
+                for file, file_info in (commit['files'] or {}).items():
+                    if file_info['add'] is not None and file_info['del'] is not None \
+                      and CommitIndex.isUnder(self.resolveRename(file), scope.path):
+                        author_stats['impact'] += file_info['add'] + file_info['del']
+        return authors
+
+    def findMostChanged(self, scope=None):
         key = "impact" if self.config.get('Most Changed', 'type') == "impact" and self.config.getboolean('Data Collection', 'impact_stats') else "commits"
-        sorted_files = sorted(self.data['files'].keys(), key=lambda k: self.data['files'][k][key], reverse=True)
+        files = self.data['files'] if scope is None else self.getScopedFileStats(scope)
+        limit = int(self.config.get('Most Changed', 'limit'))
+
+        # Files can be ranked by their score instead (always for the whole history)
+        if self.config.get('Most Changed', 'type') in ("downstream", "fragility"):
+            key = self.config.get('Most Changed', 'type')
+            scores = self.getFileScores()[key]
+            files = {file: dict(file_stats, **{key: scores[file]}) for (file, file_stats) in files.items() if file in scores}
+
+        # Only the top few are wanted, no need to sort every file
+        if limit >= 0:
+            return heapq.nlargest(limit, files.items(), key=lambda item: item[1].get(key, 0))
+
+        sorted_files = sorted(files.keys(), key=lambda k: files[k].get(key, 0), reverse=True)
         most_changed = []
 
         for file in sorted_files:
-            most_changed.append((file, self.data['files'][file]))
+            most_changed.append((file, files[file]))
 
-        return most_changed[:int(self.config.get('Most Changed', 'limit'))]
+        return most_changed[:limit]
 
-    def findTopContributor(self):
+    def findTopContributor(self, scope=None):
         key = "impact" if self.config.get('Top Contributor', 'type') == "impact" and self.config.getboolean('Data Collection', 'impact_stats') else "commits"
-        sorted_authors = sorted(self.data['authors'].keys(), key=lambda k: self.data['authors'][k][key], reverse=True)
+        authors = self.data['authors'] if scope is None else self.getScopedAuthorStats(scope)
+        limit = int(self.config.get('Top Contributor', 'limit'))
+
+        if limit >= 0:
+            return heapq.nlargest(limit, authors.items(), key=lambda item: item[1].get(key, 0))
+
+        sorted_authors = sorted(authors.keys(), key=lambda k: authors[k].get(key, 0), reverse=True)
         top_contributors = []
 
         for author in sorted_authors:
-            top_contributors.append((author, self.data['authors'][author]))
+            top_contributors.append((author, authors[author]))
+
+        return top_contributors[:limit]
+
+    def getFileActivity(self):
+        """
+            ({file: changes weighted by recency and churn}, {file: number of changes})
+            over the commits used for dependency inference
+        """
+        half_life = float(self.config.get('Scoring', 'half_life', fallback="180"))
+        path_index = self.path_index if self.path_index is not None else self.buildPathIndex()
+        activity = {}
+        changes = {}
+
+        # Big changes count for more, but not in proportion to their size
+        def getChurn(lines):
+            return 1 + math.log1p(lines) if lines is not None else 1
+
+        if self.stream is not None:
+            # There are no commits to date the changes by
+            for file, file_stats in self.data['files'].items():
+                if path_index.classify(file) is not None:
+                    changes[file] = file_stats['commits']
+                    lines = file_stats['impact'] / file_stats['commits'] if "impact" in file_stats else None
+                    activity[file] = file_stats['commits'] * getChurn(lines)
+            return (activity, changes)
+
+        start = 1 if self.config.getboolean('Dependency Inference', 'ignore_first_commit') else 0
+        newest = max(commit['date'] for commit in self.data['commits'].values()) if self.data['commits'] else 0
+        for commit in itertools.islice(self.data['commits'].values(), start, None):
+            if commit['files'] is None:
+                continue
+
+            # Changes lose half their weight every half_life days
+            recency = 0.5 ** ((newest - commit['date']) / 86400 / half_life) if half_life > 0 else 1
+            for file, file_info in commit['files'].items():
+                live_file = path_index.classify(file)
+                if live_file is None:
+                    continue
+                lines = file_info['add'] + file_info['del'] if file_info['add'] is not None and file_info['del'] is not None else None
+                changes[live_file] = changes.get(live_file, 0) + 1
+                activity[live_file] = activity.get(live_file, 0) + recency * getChurn(lines)
+        return (activity, changes)
 
-        return top_contributors[:int(self.config.get('Top Contributor', 'limit'))]
+    def getFileScores(self):
+        """
+            {"downstream": {file: score}, "fragility": {file: score}} for every
+            file with co-changes (see FileScorer)
+        """
+        if self.file_scores is None:
+            # Scored over every file, whatever the dependency inference breadth
+            matrix = self.countCoChanges(lambda file, live_file: True)
+            matrix.build(int(self.config.get('Dependency Inference', 'threshold')), int(self.config.get('Dependency Inference', 'neighbor_limit', fallback="-1")))
+            activity, changes = self.getFileActivity()
+
+            scorer = FileScores.FileScorer(float(self.config.get('Scoring', 'damping', fallback="0.85")),
+                float(self.config.get('Scoring', 'tolerance', fallback="1e-6")), int(self.config.get('Scoring', 'max_iterations', fallback="100")))
+            downstream, fragility = scorer.score(matrix.paths, matrix.getEdges(),
+                [changes.get(file, 0) for file in matrix.paths], [activity.get(file, 0) for file in matrix.paths])
+            self.profiler.count("score_iterations", scorer.iterations)
+            self.file_scores = {"downstream": downstream, "fragility": fragility}
+        return self.file_scores
+
+    def findTopScores(self):
+        limit = int(self.config.get('Scoring', 'limit', fallback="10"))
+        top_scores = {}
+        for score_type, scores in self.getFileScores().items():
+            if limit >= 0:
+                top_scores[score_type] = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            else:
+                top_scores[score_type] = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return top_scores
 
     def findStructures(self):
         # Load the structure location configs
-        config_paths = self.config.get('Structure Location', 'configs').split(',')
-        doc_dirs = self.config.get('Structure Location', 'doc_dirs').split(',')
-        include_dirs = self.config.get('Structure Location', 'include_dirs').split(',')
-        src_dirs = self.config.get('Structure Location', 'src_dirs').split(',')
-        test_dirs = self.config.get('Structure Location', 'test_dirs').split(',')
-        vendor_dirs = self.config.get('Structure Location', 'vendor_dirs').split(',')
-        useful_files = self.config.get('Structure Location', 'useful_files').split(',')
+        config_paths = set(self.config.get('Structure Location', 'configs').split(','))
+        doc_dirs = set(self.config.get('Structure Location', 'doc_dirs').split(','))
+        include_dirs = set(self.config.get('Structure Location', 'include_dirs').split(','))
+        src_dirs = set(self.config.get('Structure Location', 'src_dirs').split(','))
+        test_dirs = set(self.config.get('Structure Location', 'test_dirs').split(','))
+        vendor_dirs = set(self.config.get('Structure Location', 'vendor_dirs').split(','))
+        useful_files = set(self.config.get('Structure Location', 'useful_files').split(','))
 
         structures = {'configs': [], 'docs': [], 'includes': [], 'sources': [], 'tests': [], 'vendor code': [], 'references': []}
-        walked = []
-
-        # We can probably find structures as we walk....
-        for root, dirs, files in os.walk(self.repo_dir):
-            dirs[:] = [d for d in dirs if d != '.git']
-            walked.append((root, dirs, files))
-
-        # First we must find and exclude vendor code (which may have it's own structures)
-        for root, dirs, files in walked:
-            vendor_code = list(set(vendor_dirs) & set(dirs))
-            structures['vendor code'] += [os.path.join(root, dir) for dir in vendor_code]
+        dir_structures = [(config_paths, 'configs'), (doc_dirs, 'docs'), (include_dirs, 'includes'), (src_dirs, 'sources'), (test_dirs, 'tests'), (useful_files, 'references')]
+        file_structures = [(config_paths, 'configs'), (useful_files, 'references')]
+
+        # Only tracked files matter, and the index lists them sorted - so everything
+        #  under a directory is contiguous and vendor code can be skipped in one go
+        listing = git.Repo(self.repo_dir).git.ls_files("-z")
+        seen_dirs = set()
+        vendor_prefix = None
+        for path in listing.split("\0"):
+            if not path or (vendor_prefix is not None and path.startswith(vendor_prefix)):
+                continue
 
-        non_vendor_paths = []
-        for root, dirs, files in walked:
+            # Visit each directory the first time we see it
+            parts = path.split("/")
             is_vendor = False
+            for depth in range(len(parts) - 1):
+                dir_path = "/".join(parts[:depth + 1])
+                if dir_path in seen_dirs:
+                    continue
+                seen_dirs.add(dir_path)
 
-            for vendor_dir in structures['vendor code']:
-                if not os.path.relpath(root, vendor_dir).startswith('..'):
+                # Vendor code may have it's own structures, we don't want those
+                if parts[depth] in vendor_dirs:
+                    structures['vendor code'].append(os.path.join(self.repo_dir, os.path.normpath(dir_path)))
+                    vendor_prefix = dir_path + "/"
                     is_vendor = True
                     break
 
-            if not is_vendor:
-                non_vendor_paths.append((root, dirs, files))
+                for names, structure in dir_structures:
+                    if parts[depth] in names:
+                        structures[structure].append(os.path.normpath(dir_path))
 
-        # Then we can continue locating the relevant structures
-        for root, dirs, files in non_vendor_paths:
-            # configs, doc, include, src, test & useful_files
-            configs = list((set(config_paths) & set(dirs)) | (set(config_paths) & set(files)))
-            structures['configs'] += [os.path.relpath(os.path.join(root, d), self.repo_dir) for d in configs]
+            if is_vendor:
+                continue
 
-            docs = list(set(doc_dirs) & set(dirs))
-            structures['docs'] += [os.path.relpath(os.path.join(root, d), self.repo_dir) for d in docs]
+            for names, structure in file_structures:
+                if parts[-1] in names:
+                    structures[structure].append(os.path.normpath(path))
 
-            includes = list(set(include_dirs) & set(dirs))
-            structures['includes'] += [os.path.relpath(os.path.join(root, d), self.repo_dir) for d in includes]
+        return structures
 
-            sources = list(set(src_dirs) & set(dirs))
-            structures['sources'] += [os.path.relpath(os.path.join(root, d), self.repo_dir) for d in sources]
+    def resolveRename(self, file):
+        return self.renames.resolve(file)
 
-            tests = list(set(test_dirs) & set(dirs))
-            structures['tests'] += [os.path.relpath(os.path.join(root, d), self.repo_dir) for d in tests]
+    def iterCommitFiles(self, start=0):
+        # The column store can hand over paths without decoding whole commits
+        if isinstance(self.data['commits'], ColumnStore.CommitColumns):
+            return self.data['commits'].store.iterCommitFiles(start)
+        return (commit['files'] for commit in itertools.islice(self.data['commits'].values(), start, None))
 
-            references = list((set(useful_files) & set(files)) | (set(useful_files) & set(dirs)))
-            structures['references'] += [os.path.relpath(os.path.join(root, d), self.repo_dir) for d in references]
+    def countCoChanges(self, is_analyzed, scope=None):
+        """
+            CoChangeMatrix of which files were committed together
 
-        return structures
+            is_analyzed(path, live_file) - whether an occurrence of a file is one
+              we're finding relations for
+            scope - only count commits in its date range/touching its path
+        """
+        # Ignore the first commit
+        start = 1 if self.config.getboolean('Dependency Inference', 'ignore_first_commit') else 0
 
-    def resolveRename(self, file):
-        if file in self.renames:
-            file = self.renames[file].last.value
-        return file
+        path_index = self.path_index if self.path_index is not None else self.buildPathIndex()
+
+        # Look at each commit one by one and record what files are together
+        commit_files = self.iterCommitFiles(start)
+        if scope is not None:
+            commit_files = (commit['files'] for commit in self.iterScopedCommits(scope, start))
+        elif self.stream is not None:
+            # Streaming mode already counted them on the way in
+            commit_files = []
+
+        matrix = CoChangeMatrix.CoChangeMatrix()
+        if self.stream is not None:
+            self.stream.fillMatrix(matrix, path_index.classify, lambda file: is_analyzed(file, path_index.classify(file)), start == 0)
+
+        for files in commit_files:
+            # Commit had too many files, not usable for dependency inference
+            if files is None:
+                continue
+
+            occurrences = []
+            for file in files:
+                # Ignored, deleted and renamed files are all sorted out by the index
+                live_file = path_index.classify(file)
+                if live_file is not None:
+                    occurrences.append((live_file, is_analyzed(file, live_file)))
+
+            matrix.addCommit(occurrences)
+
+        return matrix
+
+    def inferDependencies(self, scope=None):
+        """
+            scope - only count commits in its date range/touching its path, and
+              only list dependencies for files under its path
+        """
+        return dict(self.iterDependencies(scope))
 
-    def inferDependencies(self):
+    def iterDependencies(self, scope=None):
+        """
+            (file, {related file: count}) for each file, worked out one at a time
+            from the co-change matrix (see inferDependencies())
+        """
         # Get the threshold config value
         threshold = int(self.config.get('Dependency Inference', 'threshold'))
 
-        # Ignore the first commit
-        commit_hashes = list(self.data['commits'].keys())
-        if self.config.getboolean('Dependency Inference', 'ignore_first_commit'):
-            commit_hashes = commit_hashes[1:]
-
         # Top vs all dependency inference
         top_only = False
         tops = []
@@ -371,69 +1300,100 @@ class Explorer:
             top_only = True
             tops = [file_stat[0] for file_stat in self.stats['most_changed']]
 
-        commits = self.data['commits']
+        self.buildPathIndex()
+        scope_path = scope.path if scope is not None else None
+        matrix = self.countCoChanges(lambda file, live_file: ((not top_only) or file in tops) and CommitIndex.isUnder(live_file, scope_path), scope)
 
-        # Look at each commit one by one and record what files are together
-        file_relations = {}
-        for commit in commit_hashes:
-            # Commit had too many files, not usable for dependency inference
-            if commits[commit]['files'] is None:
+        # Limit it to only files with relationships above the threshold
+        self.cochange = matrix.build(threshold, int(self.config.get('Dependency Inference', 'neighbor_limit', fallback="-1")))
+        code_check = self.config.getboolean('Dependency Inference', 'code_check')
+        for file in self.cochange:
+            # Related files outside the path get an entry too, like with "top" breadth
+            if scope_path and not CommitIndex.isUnder(file, scope_path):
                 continue
+            yield (file, self.mergeImports(file, self.cochange[file]) if code_check else self.cochange[file])
 
-            # This looks ugly...we can probably simplify it
-            for file in commits[commit]['files']:
-                if top_only and file not in tops:
-                    continue
-
-                if self.doesIgnorePath(file):
-                    continue
-
-                if not pathlib.Path(os.path.join(self.repo_dir, file)).exists():
-                    new_file = self.resolveRename(file)
-                    if file != new_file and pathlib.Path(os.path.join(self.repo_dir, new_file)).exists():
-                        file = new_file
-                    else:
-                        continue
-
-                if file not in file_relations:
-                    file_relations[file] = {}
-
-                for related_file in commits[commit]['files']:
-                    if self.doesIgnorePath(related_file):
-                        continue
-
-                    if not pathlib.Path(os.path.join(self.repo_dir, related_file)).exists():
-                        new_file = self.resolveRename(related_file)
-                        if related_file != new_file and pathlib.Path(os.path.join(self.repo_dir, new_file)).exists():
-                            related_file = new_file
-                        else:
-                            continue
-
-                    if related_file == file:
-                        continue
+    def getImportGraph(self):
+        """
+            {path: set of paths it imports} for each file in HEAD that can be parsed
+        """
+        if self.import_graph is None:
+            file_types = self.getFileTypes()
+            files = [(path, sha, file_types[path][0]) for (path, sha) in self.getTreeBlobs()]
+            jobs = int(self.config.get('Dependency Inference', 'code_check_jobs', fallback=str(os.cpu_count() or 1)))
+            graph = ImportGraph.ImportGraph(self.repo_dir, self.getBlobCache(), jobs)
+            self.import_graph = graph.build(files, [path for (path, sha) in self.getTreeBlobs()])
+            self.profiler.count("imports_cached", graph.cache_hits)
+            self.profiler.count("imports_parsed", graph.parsed)
+        return self.import_graph
+
+    def getImportLinks(self):
+        """
+            {path: set of paths it imports or is imported by}
+        """
+        if self.import_links is None:
+            self.import_links = {}
+            for file, imported_files in self.getImportGraph().items():
+                for imported_file in imported_files:
+                    self.import_links.setdefault(file, set()).add(imported_file)
+                    self.import_links.setdefault(imported_file, set()).add(file)
+        return self.import_links
+
+    def mergeImports(self, file, related):
+        """
+            Combine a file's co-change counts with static imports - files that
+            import one another are related whether or not they were committed
+            together, while co-changed source files with no import between them
+            are counted down as likely coincidences
+        """
+        import_weight = int(self.config.get('Dependency Inference', 'import_weight', fallback="2"))
+        unlinked_weight = float(self.config.get('Dependency Inference', 'unlinked_weight', fallback="0.5"))
+        limit = int(self.config.get('Dependency Inference', 'neighbor_limit', fallback="-1"))
+        graph = self.getImportGraph()
+
+        linked_files = set(linked_file for linked_file in self.getImportLinks().get(file, ()) if not self.doesIgnorePath(linked_file))
+        weights = {}
+        for related_file, count in related.items():
+            if related_file in linked_files:
+                weights[related_file] = count + import_weight
+            elif file in graph and related_file in graph:
+                # Only files we could parse can be said not to import one another
+                weights[related_file] = count * unlinked_weight
+            else:
+                weights[related_file] = count
 
-                    file_relations[file][related_file] = 1 if related_file not in file_relations[file] else file_relations[file][related_file] + 1
+        for linked_file in linked_files:
+            if linked_file not in weights:
+                weights[linked_file] = import_weight
+                self.profiler.count("import_edges_added")
 
-                    if related_file not in file_relations:
-                        file_relations[related_file] = {file: 1}
-                    elif file not in file_relations[related_file]:
-                        file_relations[related_file][file] = 1
-                    else:
-                        file_relations[related_file][file] += 1
+        if limit != -1:
+            # Ties broken by path, as in CoChangeMatrix
+            weights = dict(sorted(weights.items(), key=lambda item: (-item[1], item[0]))[:limit])
+        return weights
 
-        # Limit it to only files with relationships above the threshold
-        for file in file_relations:
-            file_relations[file] = {k:v for (k, v) in file_relations[file].items() if v > threshold}
+    def getOutputFormat(self):
+        return self.config.get('Output', 'format', fallback="json")
 
-        return file_relations
+    def openOutput(self, filename):
+        """
+            Have explore() write each phase to an NDJSON file as it finishes,
+            output() then just finishes the file off
+        """
+        self.output_writer = OutputWriter.NDJSONWriter(filename, os.path.abspath(self.repo_dir))
 
     def output(self, file=False, filename=""):
-        if file and len(filename):
-            with open(filename, "w") as f:
-                f.write(json.dumps(self.stats))
-        else:
-            pp = pprint.PrettyPrinter(indent=4)
-            pp.pprint(self.stats)
+        with self.profiler.phase("output"):
+            if self.output_writer is not None:
+                self.output_writer.close()
+                self.output_writer = None
+            elif file and len(filename):
+                # Encoded a piece at a time rather than as one big string
+                with open(filename, "w") as f:
+                    json.dump(self.stats, f)
+            else:
+                pp = pprint.PrettyPrinter(indent=4)
+                pp.pprint(self.stats)
 
     def aggregateBasicInfo(self):
         """
@@ -442,17 +1402,31 @@ class Explorer:
             Last commit date & Author
         """
         basic_stats = {"total": 0, "first":{}, "last": {}}
-        commit_hashes = list(self.data['commits'].keys())
-        basic_stats['total'] = len(commit_hashes)
-        basic_stats['first'] = {commit_hashes[-1]: self.data['commits'][commit_hashes[0]]}
-        basic_stats['last'] = {commit_hashes[0]: self.data['commits'][commit_hashes[-1]]}
+        if self.stream is not None:
+            first_hash, first_commit = self.stream.getFirstCommit()
+            last_hash, last_commit = self.stream.getLastCommit()
+            basic_stats['total'] = self.stream.commits
+            basic_stats['first'] = {last_hash: first_commit}
+            basic_stats['last'] = {first_hash: last_commit}
+            return basic_stats
+
+        commits = self.data['commits']
+        first_hash = next(iter(commits))
+        last_hash = next(reversed(commits))
+        basic_stats['total'] = len(commits)
+        basic_stats['first'] = {last_hash: commits[first_hash]}
+        basic_stats['last'] = {first_hash: commits[last_hash]}
         return basic_stats
 
     def getCache(self):
-        return {"data": self.data, "renames": {k: list(self.renames[k]) for k in self.renames}, "timestamp": int(time.time())}
+        return {"data": self.data, "renames": self.renames.serialize(), "last_commit": self.last_commit, "timestamp": int(time.time())}
 
     def loadCache(self, cache, force=False):
         # 60 (seconds) * 60 (minutes) * 24 (hours) = 86,400 seconds = 1 day
-        if (not force) and cache['timestamp'] < time.time() - (int(self.config.get('Caching', 'cache_ttl')) * 86400):
+        cache_ttl = int(self.config.get('Caching', 'cache_ttl'))
+        if (not force) and cache_ttl != -1 and cache['timestamp'] < time.time() - (cache_ttl * 86400):
             raise Exception("Expired cache")
-        return (cache['data'], {k: llist.sllist(cache['renames'][k]) for k in cache['renames']})
+
+        renames = RenameResolver.RenameResolver.unserialize(cache['renames'])
+        self.last_commit = cache.get('last_commit')
+        return (cache['data'], renames, self.last_commit)
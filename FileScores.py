@@ -0,0 +1,138 @@
+# RepoExplorer: A utility to quickly familiarize oneself with a code repo.
+# Copyright (C) 2019  Jon Stockton <jonstockton1416@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# NumPy/SciPy are optional, without them we fall back to iterating over dicts
+try:
+    import numpy
+    import scipy.sparse
+except ImportError:
+    numpy = None
+
+class FileScorer:
+    """
+        Downstream impact and fragility of each file from the co-change graph
+
+        A change to file i drags file j along with a chance of P[i, j] - the
+        commits they share over the number of commits to i.  Starting from each
+        file's activity a (its changes weighted by recency and churn):
+          downstream = a + d * P @ downstream - how much changing a file sets off
+          fragility = a + d * P.T @ fragility - how often a file gets dragged in
+        Rows of P (columns for fragility) that sum to more than 1 are scaled
+        down to 1, so both converge for any damping d below 1 without one busy
+        file damping everyone else.  Scores are scaled to a max of 1.
+    """
+    def __init__(self, damping=0.85, tolerance=1e-6, max_iterations=100):
+        self.damping = damping
+        self.tolerance = tolerance
+        self.max_iterations = max_iterations
+        self.iterations = 0
+
+    def score(self, paths, edges, changes, activity):
+        """
+            paths - file names by id
+            edges - (ids, related ids, counts) as from CoChangeMatrix.getEdges(),
+              built with every file analyzed - so each shared commit is counted
+              twice, once from each file's side
+            changes - number of commits to each file, by id
+            activity - recency/churn weighted changes of each file, by id
+            Returns ({path: downstream score}, {path: fragility score})
+        """
+        self.iterations = 0
+        if not paths:
+            return ({}, {})
+
+        total = sum(activity)
+        activity = [weight / total for weight in activity] if total > 0 else [1 / len(paths)] * len(paths)
+        if numpy is None:
+            downstream, fragility = self.scoreDicts(len(paths), edges, changes, activity)
+        else:
+            downstream, fragility = self.scoreSparse(len(paths), edges, changes, activity)
+
+        return (self.scale(paths, downstream), self.scale(paths, fragility))
+
+    def getSparseChances(self, size, edges, changes):
+        """
+            P as a sparse matrix
+        """
+        rows, cols = (numpy.asarray(ids, dtype=numpy.int64) for ids in edges[:2])
+        counts = numpy.asarray(edges[2], dtype=numpy.float64) / 2
+        changes = numpy.maximum(numpy.asarray(changes, dtype=numpy.float64), 1)
+        return scipy.sparse.csr_matrix((counts / changes[rows], (rows, cols)), shape=(size, size))
+
+    def scoreSparse(self, size, edges, changes, activity):
+        chance = self.getSparseChances(size, edges, changes)
+        row_limits = numpy.maximum(numpy.asarray(chance.sum(axis=1)).ravel(), 1)
+        column_limits = numpy.maximum(numpy.asarray(chance.sum(axis=0)).ravel(), 1)
+        down = scipy.sparse.diags(1 / row_limits) @ chance
+        up = (chance @ scipy.sparse.diags(1 / column_limits)).T.tocsr()
+
+        activity = numpy.asarray(activity, dtype=numpy.float64)
+        return (self.propagate(lambda scores: down @ scores, activity), self.propagate(lambda scores: up @ scores, activity))
+
+    def getChances(self, size, edges, changes):
+        """
+            P as a list of rows, {related id: chance}
+        """
+        chance = [{} for i in range(size)]
+        for file, related_file, count in zip(*edges):
+            chance[file][related_file] = count / 2 / max(changes[file], 1)
+        return chance
+
+    def scoreDicts(self, size, edges, changes, activity):
+        chance = self.getChances(size, edges, changes)
+        row_limits = [max(sum(row.values()), 1) for row in chance]
+        column_limits = [0.0] * size
+        for row in chance:
+            for related_file, weight in row.items():
+                column_limits[related_file] += weight
+        column_limits = [max(limit, 1) for limit in column_limits]
+
+        def spreadDown(scores):
+            return [sum(weight * scores[related_file] for (related_file, weight) in row.items()) / row_limits[file] for (file, row) in enumerate(chance)]
+
+        def spreadUp(scores):
+            spread = [0.0] * size
+            for file, row in enumerate(chance):
+                for related_file, weight in row.items():
+                    spread[related_file] += weight * scores[file] / column_limits[related_file]
+            return spread
+
+        return (self.propagate(spreadDown, activity), self.propagate(spreadUp, activity))
+
+    def propagate(self, spread, activity):
+        scores = activity
+        for iteration in range(1, self.max_iterations + 1):
+            spread_scores = spread(scores)
+            if numpy is not None:
+                updated = activity + self.damping * spread_scores
+                change = numpy.abs(updated - scores).sum()
+                total = updated.sum()
+            else:
+                updated = [weight + self.damping * spread_score for (weight, spread_score) in zip(activity, spread_scores)]
+                change = sum(abs(new - old) for (new, old) in zip(updated, scores))
+                total = sum(updated)
+
+            scores = updated
+            if change <= self.tolerance * total:
+                break
+
+        self.iterations = max(self.iterations, iteration)
+        return scores
+
+    def scale(self, paths, scores):
+        scores = [float(score) for score in scores]
+        top = max(scores) or 1.0
+        return {path: score / top for (path, score) in zip(paths, scores)}
@@ -0,0 +1,236 @@
+# RepoExplorer: A utility to quickly familiarize oneself with a code repo.
+# Copyright (C) 2019  Jon Stockton <jonstockton1416@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import multiprocessing
+import posixpath
+import re
+import git
+
+PYTHON_IMPORT = re.compile(r"^[ \t]*import[ \t]+([^\n#;]+)", re.M)
+PYTHON_FROM_IMPORT = re.compile(r"^[ \t]*from[ \t]+(\.*[\w.]*)[ \t]+import[ \t]+(\([^)]*\)|[^\n#;]+)", re.M)
+C_INCLUDE = re.compile(r"^[ \t]*#[ \t]*include[ \t]*[<\"]([^>\"\n]+)[>\"]", re.M)
+JS_IMPORTS = [
+    re.compile(r"\brequire\(\s*['\"]([^'\"\n]+)['\"]\s*\)"),
+    re.compile(r"\bimport\s*\(\s*['\"]([^'\"\n]+)['\"]\s*\)"),
+    re.compile(r"^[ \t]*(?:import|export)\b[\w\s{},*$]*?\bfrom\s*['\"]([^'\"\n]+)['\"]", re.M),
+    re.compile(r"^[ \t]*import\s*['\"]([^'\"\n]+)['\"]", re.M)
+]
+PHP_USE = re.compile(r"^[ \t]*use[ \t]+(?:function[ \t]+|const[ \t]+)?\\?([\w\\]+)", re.M)
+PHP_REQUIRE = re.compile(r"\b(?:require|include)(?:_once)?\s*\(?\s*(?:__DIR__\s*\.\s*)?['\"]([^'\"\n]+)['\"]")
+
+# Languages (as identified by LanguageIdentifier) that can be parsed, and how they're resolved
+LANGUAGES = {"Python": "Python", "C": "C", "C++": "C", "JavaScript": "JavaScript", "TypeScript": "JavaScript", "PHP": "PHP"}
+JS_EXTENSIONS = ["", ".js", ".mjs", ".cjs", ".jsx", ".ts", ".tsx", "/index.js", "/index.jsx", "/index.ts", "/index.tsx"]
+
+def parseImports(language, content):
+    """
+        Imports of a source file as [[candidate, ...], ...] - each import's
+        possible targets in order of preference, still to be resolved to paths
+    """
+    imports = []
+    if language == "Python":
+        for match in PYTHON_IMPORT.finditer(content):
+            for name in match.group(1).split(","):
+                name = name.split(" as ")[0].strip()
+                if name:
+                    imports.append([name])
+        for match in PYTHON_FROM_IMPORT.finditer(content):
+            module = match.group(1)
+            # "from package import module" may or may not be importing a module
+            for name in match.group(2).strip("()").split(","):
+                name = name.split(" as ")[0].strip().strip("\\").strip()
+                if name and name != "*":
+                    imports.append([module + name if module.endswith(".") else "%s.%s" % (module, name), module])
+                elif name == "*":
+                    imports.append([module])
+    elif language == "C":
+        imports = [[match.group(1)] for match in C_INCLUDE.finditer(content)]
+    elif language == "JavaScript":
+        for pattern in JS_IMPORTS:
+            imports += [[match.group(1)] for match in pattern.finditer(content)]
+    elif language == "PHP":
+        imports = [[match.group(1).replace("\\", "/") + ".php"] for match in PHP_USE.finditer(content)]
+        imports += [[match.group(1)] for match in PHP_REQUIRE.finditer(content)]
+    return imports
+
+# Per-process state for the parse worker pool
+worker_repo = None
+
+def initParseWorker(repo_dir):
+    global worker_repo
+    worker_repo = git.Repo(repo_dir)
+
+def parseWorker(task):
+    sha, language = task
+    content = worker_repo.odb.stream(bytes.fromhex(sha)).read()
+    return (sha, language, parseImports(language, content.decode('utf-8', 'replace')))
+
+class ImportResolver:
+    """
+        Resolves imports to the files in the tree
+
+        Anything that doesn't resolve (the standard library, packages installed
+        elsewhere, system headers...) is dropped.  Where an import could be
+        several files the one closest to the importing file wins.
+    """
+    def __init__(self, paths):
+        self.paths = set(paths)
+        self.modules = {}
+        self.names = {}
+        for path in sorted(self.paths):
+            self.names.setdefault(posixpath.basename(path), []).append(path)
+
+            # Python modules are indexed from every directory they could be imported from
+            if path.endswith(".py"):
+                parts = path[:-3].split("/")
+                if parts[-1] == "__init__":
+                    parts = parts[:-1]
+                for i in range(len(parts)):
+                    self.modules.setdefault(".".join(parts[i:]), []).append(path)
+
+    def closest(self, importer, candidates):
+        if not candidates:
+            return None
+        directory = posixpath.dirname(importer).split("/")
+        def sharedDirs(path):
+            shared = 0
+            for a, b in zip(directory, posixpath.dirname(path).split("/")):
+                if a != b:
+                    break
+                shared += 1
+            return shared
+        return max(candidates, key=sharedDirs)
+
+    def findSuffix(self, importer, suffix):
+        suffix = posixpath.normpath(suffix).lstrip("/")
+        candidates = [path for path in self.names.get(posixpath.basename(suffix), []) if path == suffix or path.endswith("/" + suffix)]
+        return self.closest(importer, candidates)
+
+    def findRelative(self, importer, target, extensions=("",)):
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(importer), target))
+        for extension in extensions:
+            if path + extension in self.paths:
+                return path + extension
+        return None
+
+    def resolvePython(self, importer, name):
+        if not name.startswith("."):
+            return self.closest(importer, self.modules.get(name))
+
+        # Relative to the importing package, one level up per extra dot
+        level = len(name) - len(name.lstrip("."))
+        package = posixpath.dirname(importer).split("/") if posixpath.dirname(importer) else []
+        package = package[:len(package) - (level - 1)] if level > 1 else package
+        module = name.lstrip(".").replace(".", "/")
+        base = "/".join(package + ([module] if module else []))
+        for path in (base + ".py", posixpath.join(base, "__init__.py")):
+            if path.lstrip("/") in self.paths:
+                return path.lstrip("/")
+        return None
+
+    def resolveNamespace(self, importer, name):
+        # Namespace prefixes are mapped to any directory (PSR-4), so leading parts may not match
+        parts = name.lstrip("/").split("/")
+        for i in range(len(parts) - 1):
+            path = self.findSuffix(importer, "/".join(parts[i:]))
+            if path is not None:
+                return path
+        return None
+
+    def resolve(self, language, importer, candidates):
+        language = LANGUAGES.get(language)
+        for candidate in candidates:
+            if language == "Python":
+                path = self.resolvePython(importer, candidate)
+            elif language == "JavaScript":
+                # Bare names are packages, not files in the repo
+                if not candidate.startswith((".", "/")):
+                    return None
+                path = self.findRelative(importer, candidate, JS_EXTENSIONS)
+            elif language == "PHP":
+                path = self.findRelative(importer, candidate) or self.resolveNamespace(importer, candidate)
+            else:
+                path = self.findRelative(importer, candidate) or self.findSuffix(importer, candidate)
+
+            if path is not None and path != importer:
+                return path
+        return None
+
+class ImportGraph:
+    """
+        Static import/include edges between the files in the tree
+
+        Each blob is parsed once - results are kept in a BlobCache (if there is
+        one) so only changed files are parsed again.  Parsing is regex based and
+        CPU bound, so misses are spread over a process pool.
+    """
+    # Not worth starting a pool for a handful of files
+    MIN_POOL_FILES = 64
+
+    def __init__(self, repo_dir, cache=None, jobs=1):
+        self.repo_dir = repo_dir
+        self.cache = cache
+        self.jobs = jobs
+        self.cache_hits = 0
+        self.parsed = 0
+
+    def parse(self, files):
+        """
+            files - [(path, blob sha, language), ...]
+            Returns {path: imports} (see parseImports())
+        """
+        files = [(path, sha, language) for (path, sha, language) in files if language in LANGUAGES]
+        wanted = set((sha, LANGUAGES[language]) for (path, sha, language) in files)
+
+        # The same content parses differently as a different language
+        found = {}
+        cached = self.cache.getMany("imports", set(sha for (sha, language) in wanted)) if self.cache is not None else {}
+        for sha, (language, imports) in cached.items():
+            found[(sha, language)] = imports
+        missing = [task for task in wanted if task not in found]
+        self.cache_hits = len(wanted) - len(missing)
+
+        if missing:
+            if self.jobs > 1 and len(missing) >= self.MIN_POOL_FILES:
+                with multiprocessing.Pool(self.jobs, initializer=initParseWorker, initargs=(self.repo_dir,)) as pool:
+                    results = list(pool.imap_unordered(parseWorker, missing, chunksize=32))
+            else:
+                initParseWorker(self.repo_dir)
+                results = [parseWorker(task) for task in missing]
+            self.parsed = len(results)
+
+            if self.cache is not None:
+                self.cache.putMany("imports", {sha: [language, imports] for (sha, language, imports) in results})
+            for sha, language, imports in results:
+                found[(sha, language)] = imports
+
+        return {path: found[(sha, LANGUAGES[language])] for (path, sha, language) in files}
+
+    def build(self, files, paths):
+        """
+            files - [(path, blob sha, language), ...] of the files to parse
+            paths - every file imports can resolve to
+            Returns {path: set of the paths it imports} for each parsed file
+        """
+        resolver = ImportResolver(paths)
+        languages = dict((path, language) for (path, sha, language) in files)
+        graph = {}
+        for path, imports in self.parse(files).items():
+            graph[path] = set()
+            for candidates in imports:
+                target = resolver.resolve(languages[path], path, candidates)
+                if target is not None:
+                    graph[path].add(target)
+        return graph
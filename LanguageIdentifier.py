@@ -0,0 +1,132 @@
+# RepoExplorer: A utility to quickly familiarize oneself with a code repo.
+# Copyright (C) 2019  Jon Stockton <jonstockton1416@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import concurrent.futures
+import os
+import threading
+import git
+import magic
+
+# Most files can be identified by name alone
+EXTENSIONS = {
+    ".py": "Python", ".pyw": "Python", ".c": "C", ".h": "C", ".cc": "C++", ".cpp": "C++", ".cxx": "C++", ".hh": "C++",
+    ".hpp": "C++", ".cs": "C#", ".java": "Java", ".kt": "Kotlin", ".scala": "Scala", ".go": "Go", ".rs": "Rust",
+    ".swift": "Swift", ".m": "Objective-C", ".js": "JavaScript", ".mjs": "JavaScript", ".jsx": "JavaScript",
+    ".ts": "TypeScript", ".tsx": "TypeScript", ".php": "PHP", ".rb": "Ruby", ".pl": "Perl", ".pm": "Perl", ".lua": "Lua",
+    ".sh": "Shell", ".bash": "Shell", ".ps1": "PowerShell", ".sql": "SQL", ".html": "HTML", ".htm": "HTML", ".css": "CSS",
+    ".scss": "SCSS", ".less": "Less", ".vue": "Vue", ".twig": "Twig", ".md": "Markdown", ".rst": "reStructuredText",
+    ".txt": "Text", ".json": "JSON", ".yml": "YAML", ".yaml": "YAML", ".toml": "TOML", ".ini": "INI", ".xml": "XML",
+    ".svg": "SVG"
+}
+BINARY_EXTENSIONS = {
+    ".png": "Image", ".jpg": "Image", ".jpeg": "Image", ".gif": "Image", ".ico": "Image", ".bmp": "Image", ".webp": "Image",
+    ".eot": "Font", ".ttf": "Font", ".otf": "Font", ".woff": "Font", ".woff2": "Font", ".zip": "Archive", ".gz": "Archive",
+    ".tgz": "Archive", ".tar": "Archive", ".jar": "Archive", ".pdf": "PDF", ".so": "Compiled", ".dll": "Compiled",
+    ".exe": "Compiled", ".o": "Compiled", ".a": "Compiled", ".class": "Compiled", ".pyc": "Compiled"
+}
+FILE_NAMES = {
+    "Makefile": "Makefile", "makefile": "Makefile", "Dockerfile": "Dockerfile", "CMakeLists.txt": "CMake",
+    "Rakefile": "Ruby", "Gemfile": "Ruby", "Jenkinsfile": "Groovy"
+}
+
+# Everything else is up to libmagic
+MIME_TYPES = {
+    "text/x-python": "Python", "text/x-script.python": "Python", "text/x-c": "C", "text/x-c++": "C++",
+    "text/x-php": "PHP", "text/x-shellscript": "Shell", "text/x-perl": "Perl", "text/x-ruby": "Ruby",
+    "text/x-java": "Java", "text/x-makefile": "Makefile", "text/x-tex": "TeX", "text/html": "HTML", "text/xml": "XML",
+    "application/json": "JSON", "application/javascript": "JavaScript", "application/xml": "XML"
+}
+
+class LanguageIdentifier:
+    """
+        Works out the language/file type of each file as (type, is_binary)
+
+        Files are identified by name where possible, only the rest have their
+        content checked with libmagic - spread over a few threads (the blob
+        reads and libmagic calls don't hold the GIL).  Content results are
+        kept in a BlobCache if there is one.
+    """
+    def __init__(self, repo_dir, cache=None, threads=4, magic_bytes=65536):
+        self.repo_dir = repo_dir
+        self.cache = cache
+        self.threads = threads
+        self.magic_bytes = magic_bytes
+        self.local = None
+        self.cache_hits = 0
+        self.checked = 0
+
+    def classifyName(self, path):
+        name = os.path.basename(path)
+        if name in FILE_NAMES:
+            return (FILE_NAMES[name], False)
+
+        extension = os.path.splitext(name)[1].lower()
+        if extension in EXTENSIONS:
+            return (EXTENSIONS[extension], False)
+        if extension in BINARY_EXTENSIONS:
+            return (BINARY_EXTENSIONS[extension], True)
+        return None
+
+    def classifyMimeType(self, mime_type):
+        if mime_type in MIME_TYPES:
+            return (MIME_TYPES[mime_type], False)
+        if mime_type.startswith("text/") or mime_type == "inode/x-empty":
+            return ("Text", False)
+        return (mime_type, True)
+
+    def classifyContent(self, sha):
+        # Neither GitPython's repo nor a libmagic handle can be shared between threads
+        if not hasattr(self.local, "repo"):
+            self.local.repo = git.Repo(self.repo_dir)
+            self.local.magic = magic.Magic(mime=True)
+
+        # libmagic only looks at the start, there's no need to read (and inflate) whole blobs
+        content = self.local.repo.odb.stream(bytes.fromhex(sha)).read(self.magic_bytes)
+        return self.classifyMimeType(self.local.magic.from_buffer(content))
+
+    def identify(self, files):
+        """
+            files - [(path, blob sha), ...]
+            Returns {path: (type, is_binary)}
+        """
+        types = {}
+        unknown = {}
+        for path, sha in files:
+            file_type = self.classifyName(path)
+            if file_type is not None:
+                types[path] = file_type
+            else:
+                unknown.setdefault(sha, []).append(path)
+
+        found = self.cache.getMany("file_types", unknown) if self.cache is not None else {}
+        self.cache_hits = len(found)
+
+        missing = [sha for sha in unknown if sha not in found]
+        if missing:
+            self.local = threading.local()
+            with concurrent.futures.ThreadPoolExecutor(self.threads) as pool:
+                checked = dict(zip(missing, pool.map(self.classifyContent, missing)))
+            self.local = None
+            self.checked = len(checked)
+
+            if self.cache is not None:
+                self.cache.putMany("file_types", checked)
+            found.update(checked)
+
+        for sha, paths in unknown.items():
+            for path in paths:
+                types[path] = tuple(found[sha])
+
+        return types
@@ -0,0 +1,88 @@
+# RepoExplorer: A utility to quickly familiarize oneself with a code repo.
+# Copyright (C) 2019  Jon Stockton <jonstockton1416@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import json
+import time
+
+OUTPUT_FORMAT = "repo-explorer-ndjson"
+OUTPUT_VERSION = 1
+
+class NDJSONWriter:
+    """
+        Writes results as they're worked out, one JSON record per line:
+          {"type": "header", "format": ..., "version": ..., "repo": ..., "started": ...}
+          {"type": "phase", "phase": <name>, "result": ...} - a whole phase
+          {"type": "record", "phase": <name>, "key": ..., "value": ...} - one entry
+            of a phase that's too big to hold (e.g. a file's dependencies),
+            followed by {"type": "phase_end", "phase": <name>, "records": <count>}
+          {"type": "end", "phases": [...], "seconds": ...}
+
+        Output is flushed as each phase finishes, so a reader can follow along
+        with a long run - a missing end record means it didn't finish.
+    """
+    # Flush every so many records within a phase too
+    FLUSH_RECORDS = 1000
+
+    def __init__(self, path, repo):
+        self.file = open(path, "w")
+        self.start_time = time.time()
+        self.phases = []
+        self.writeLine({"type": "header", "format": OUTPUT_FORMAT, "version": OUTPUT_VERSION, "repo": repo, "started": int(self.start_time)})
+        self.file.flush()
+
+    def writeLine(self, record):
+        self.file.write(json.dumps(record))
+        self.file.write("\n")
+
+    def writePhase(self, phase, result):
+        self.writeLine({"type": "phase", "phase": phase, "result": result})
+        self.phases.append(phase)
+        self.file.flush()
+
+    def writeRecords(self, phase, records):
+        """
+            records - (key, value) pairs, written as they're produced
+        """
+        count = 0
+        for key, value in records:
+            self.writeLine({"type": "record", "phase": phase, "key": key, "value": value})
+            count += 1
+            if not count % self.FLUSH_RECORDS:
+                self.file.flush()
+
+        self.writeLine({"type": "phase_end", "phase": phase, "records": count})
+        self.phases.append(phase)
+        self.file.flush()
+
+    def close(self):
+        self.writeLine({"type": "end", "phases": self.phases, "seconds": time.time() - self.start_time})
+        self.file.close()
+
+def readNDJSON(path):
+    """
+        Put a (finished or not) NDJSON output back together as a stats dict
+    """
+    stats = {}
+    with open(path, "r") as f:
+        for line in f:
+            # A run that's still going may have a partly written last line
+            if not line.endswith("\n"):
+                break
+            record = json.loads(line)
+            if record['type'] == "phase":
+                stats[record['phase']] = record['result']
+            elif record['type'] == "record":
+                stats.setdefault(record['phase'], {})[record['key']] = record['value']
+    return stats
@@ -0,0 +1,75 @@
+# RepoExplorer: A utility to quickly familiarize oneself with a code repo.
+# Copyright (C) 2019  Jon Stockton <jonstockton1416@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import os
+
+class PathIndex:
+    """
+        Classifies paths for dependency inference, built once per run
+
+        ignored_extensions - suffixes to ignore (matched with str.endswith like before)
+        ignored_dirs - structure paths to ignore, relative to the repo, kept in a
+          trie of path components
+        live_paths - every path in the HEAD tree, used instead of stat() calls
+        resolve - function mapping a historical path to its current name
+        ignored_paths - current paths to ignore outright (e.g. binary files)
+    """
+    def __init__(self, ignored_extensions, ignored_dirs, live_paths, resolve, ignored_paths=()):
+        self.ignored_extensions = tuple(ignored_extensions)
+        self.ignored_paths = set(ignored_paths)
+        self.live_paths = live_paths
+        self.resolve = resolve
+        self.ignored = {}
+        self.classified = {}
+
+        self.trie = {}
+        for dir in ignored_dirs:
+            node = self.trie
+            for part in os.path.normpath(dir).split(os.sep):
+                node = node.setdefault(part, {})
+            node[None] = True
+
+    def isIgnoredDir(self, path):
+        node = self.trie
+        for part in os.path.normpath(path).split(os.sep):
+            if part not in node:
+                return False
+            node = node[part]
+            if None in node:
+                return True
+        return False
+
+    def isIgnored(self, path):
+        if path not in self.ignored:
+            self.ignored[path] = path.endswith(self.ignored_extensions) or path in self.ignored_paths or self.isIgnoredDir(path)
+        return self.ignored[path]
+
+    def classify(self, path):
+        """
+            The current name of a path if it's usable for analysis, otherwise None
+        """
+        if path not in self.classified:
+            live_path = None
+            if not self.isIgnored(path):
+                if path in self.live_paths:
+                    live_path = path
+                else:
+                    new_path = self.resolve(path)
+                    if new_path != path and new_path in self.live_paths:
+                        live_path = new_path
+                if live_path in self.ignored_paths:
+                    live_path = None
+            self.classified[path] = live_path
+        return self.classified[path]
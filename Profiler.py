@@ -0,0 +1,149 @@
+# RepoExplorer: A utility to quickly familiarize oneself with a code repo.
+# Copyright (C) 2019  Jon Stockton <jonstockton1416@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import collections
+import contextlib
+import cProfile
+import json
+import sys
+import time
+
+# resource isn't available everywhere (Windows), peak RSS just won't be reported there
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def getPeakRss(who=None):
+    """
+        Peak resident set size in KB so far
+    """
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    # macOS reports bytes, everyone else KB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+def resetPeakRss():
+    """
+        Start the peak over from the current RSS (Linux only) - returns whether
+        it could be, if not the peak can only be told apart when it goes up
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+class Profiler:
+    """
+        Wall time, CPU time and peak RSS per phase plus throughput counters
+
+        Phases that are entered more than once (e.g. per commit) accumulate.
+        A phase's peak RSS is its own - on Linux the peak is reset as each
+        phase starts (carrying it over to any phases it's nested in).  Elsewhere
+        a phase only gets a peak if it went past everything before it.
+    """
+    def __init__(self):
+        self.phases = collections.OrderedDict()
+        self.counters = collections.Counter()
+        self.profile = None
+        # Peaks of the phases currently running, outermost first
+        self.open_peaks = []
+        # Resetting the peak resets the process' ru_maxrss too, so it's kept here
+        self.peak_rss = None
+
+    def notePeak(self):
+        peak = getPeakRss()
+        if peak is None:
+            return None
+        self.peak_rss = max(self.peak_rss or 0, peak)
+        self.open_peaks = [max(open_peak or 0, peak) for open_peak in self.open_peaks]
+        return peak
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        # Whatever the enclosing phases peaked at so far is theirs, this one starts from now
+        start_peak = self.notePeak()
+        if start_peak is not None and resetPeakRss():
+            start_peak = None
+        self.open_peaks.append(None)
+
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            end_peak = self.notePeak()
+            peak = self.open_peaks.pop()
+            if start_peak is not None and end_peak is not None and end_peak <= start_peak:
+                # Couldn't reset it, and it never went past the old peak - unknown
+                peak = None
+
+            if name not in self.phases:
+                self.phases[name] = {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_rss_kb": None}
+            phase = self.phases[name]
+            phase['calls'] += 1
+            phase['wall_seconds'] += time.perf_counter() - wall
+            phase['cpu_seconds'] += time.process_time() - cpu
+            if peak is not None:
+                phase['peak_rss_kb'] = max(phase['peak_rss_kb'] or 0, peak)
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def takeCounters(self):
+        # Worker processes hand their counters back with each batch of results
+        counters = dict(self.counters)
+        self.counters.clear()
+        return counters
+
+    def mergeCounters(self, counters):
+        self.counters.update(counters)
+
+    def startProfile(self):
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def dumpProfile(self, path):
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(path)
+
+    def getRate(self, counter, phase):
+        if phase not in self.phases or not self.phases[phase]['wall_seconds']:
+            return None
+        return self.counters[counter] / self.phases[phase]['wall_seconds']
+
+    def getReport(self):
+        self.notePeak()
+        return {
+            "timestamp": int(time.time()),
+            "phases": self.phases,
+            "counters": dict(self.counters),
+            "throughput": {
+                "commits_per_second": self.getRate("commits", "collect"),
+                "blobs_diffed_per_second": self.getRate("blobs_diffed", "collect"),
+                "bytes_read_per_second": self.getRate("bytes_read", "collect")
+            },
+            "peak_rss_kb": self.peak_rss,
+            "peak_worker_rss_kb": getPeakRss(resource.RUSAGE_CHILDREN) if resource is not None else None
+        }
+
+    def writeReport(self, path):
+        with open(path, "w") as f:
+            f.write(json.dumps(self.getReport(), indent=4))
@@ -0,0 +1,76 @@
+# RepoExplorer: A utility to quickly familiarize oneself with a code repo.
+# Copyright (C) 2019  Jon Stockton <jonstockton1416@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+class RenameResolver:
+    """
+        Resolves any path a file has had to the file's latest name
+
+        Every renamed file gets a lineage id, each path maps to the lineage that
+        most recently used it, and each lineage remembers its current name -
+        so renames (and resolving A -> B -> C) are O(1) with no chains to walk.
+    """
+    def __init__(self):
+        self.lineages = {}
+        self.names = []
+
+    def rename(self, a_path, b_path):
+        if a_path == b_path:
+            return
+
+        # a_path may be a new file reusing a name some other file renamed away from
+        if a_path not in self.lineages or self.names[self.lineages[a_path]] != a_path:
+            self.lineages[a_path] = len(self.names)
+            self.names.append(a_path)
+
+        lineage = self.lineages[a_path]
+        self.lineages[b_path] = lineage
+        self.names[lineage] = b_path
+
+    def resolve(self, path):
+        if path in self.lineages:
+            return self.names[self.lineages[path]]
+        return path
+
+    def __contains__(self, path):
+        return path in self.lineages
+
+    def __len__(self):
+        return len(self.lineages)
+
+    def serialize(self):
+        # Paths are stored once, lineages refer to them by index
+        paths = list(self.lineages)
+        index = {path: i for (i, path) in enumerate(paths)}
+        return {
+            "paths": paths,
+            "lineages": [self.lineages[path] for path in paths],
+            "names": [index[name] for name in self.names]
+        }
+
+    @classmethod
+    def unserialize(cls, cache):
+        resolver = cls()
+
+        # Older caches stored a list per path of every name it had, in order
+        if not (isinstance(cache.get('lineages'), list) and all(isinstance(i, int) for i in cache['lineages'][:1])):
+            for chain in dict.fromkeys(tuple(chain) for chain in cache.values()):
+                for a_path, b_path in zip(chain, chain[1:]):
+                    resolver.rename(a_path, b_path)
+            return resolver
+
+        resolver.lineages = dict(zip(cache['paths'], cache['lineages']))
+        resolver.names = [cache['paths'][i] for i in cache['names']]
+        return resolver
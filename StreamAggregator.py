@@ -0,0 +1,96 @@
+# RepoExplorer: A utility to quickly familiarize oneself with a code repo.
+# Copyright (C) 2019  Jon Stockton <jonstockton1416@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+class StreamAggregator:
+    """
+        Everything the analyses need from the commit table, kept up to date as
+        commits are collected so the table itself never has to be kept
+
+        Co-change is counted between paths as they were committed, since which
+        files are ignored, renamed or analyzed is only known once collection is
+        over - fillMatrix() sorts that out.  Memory grows with the number of
+        files (and pairs of files changed together), not with history length.
+    """
+    def __init__(self):
+        self.commits = 0
+        self.first = None
+        self.last = None
+        self.ids = {}
+        self.paths = []
+        self.pairs = {}
+
+    def getId(self, path):
+        if path not in self.ids:
+            self.ids[path] = len(self.paths)
+            self.paths.append(path)
+        return self.ids[path]
+
+    def addCommit(self, commit_hash, commit):
+        self.commits += 1
+        self.last = (commit_hash, commit)
+
+        # The first commit is kept whole, it may or may not be wanted for dependencies
+        if self.first is None:
+            self.first = (commit_hash, commit)
+            return
+
+        # Commit had too many files, not usable for dependency inference
+        if commit['files'] is None:
+            return
+
+        files = [self.getId(file) for file in commit['files']]
+        for i, file in enumerate(files):
+            for related_file in files[i + 1:]:
+                # One int per pair is a lot smaller than a tuple
+                pair = (min(file, related_file) << 32) | max(file, related_file)
+                self.pairs[pair] = self.pairs.get(pair, 0) + 1
+
+    def fillMatrix(self, matrix, classify, is_analyzed, include_first=False):
+        """
+            Add the counts to a CoChangeMatrix
+
+            classify - the current name of a path or None if it's not used
+            is_analyzed - whether a (committed) path is one we're finding
+              dependencies for
+        """
+        if include_first and self.first is not None and self.first[1]['files'] is not None:
+            occurrences = []
+            for file in self.first[1]['files']:
+                live_file = classify(file)
+                if live_file is not None:
+                    occurrences.append((live_file, is_analyzed(file)))
+            matrix.addCommit(occurrences)
+
+        # Files are added in the order they were first seen, like they would be commit by commit
+        live_files = [classify(path) for path in self.paths]
+        analyzed = [is_analyzed(path) for path in self.paths]
+        for file, live_file in enumerate(live_files):
+            if live_file is not None:
+                matrix.addFile(live_file, analyzed[file])
+
+        # Each commit adds one per analyzed file of the pair (in both directions)
+        for pair, count in self.pairs.items():
+            file, related_file = pair >> 32, pair & 0xffffffff
+            weight = count * (analyzed[file] + analyzed[related_file])
+            live_file, live_related_file = live_files[file], live_files[related_file]
+            if weight and live_file is not None and live_related_file is not None and live_file != live_related_file:
+                matrix.addPair(live_file, live_related_file, weight)
+
+    def getFirstCommit(self):
+        return self.first
+
+    def getLastCommit(self):
+        return self.last
@@ -0,0 +1,175 @@
+#!/usr/bin/python3
+# RepoExplorer: A utility to quickly familiarize oneself with a code repo.
+# Copyright (C) 2019  Jon Stockton <jonstockton1416@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import argparse
+import configparser
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import time
+import traceback
+import Explorer
+
+argparser = argparse.ArgumentParser(description="Analyze many git repos at once.")
+argparser.add_argument("manifest", help="File listing one repo path per line (# for comments), relative paths are relative to the manifest", type=str)
+argparser.add_argument("-i", "--ini_file", help="Config file location, shared by every repo.", type=str, required=True)
+argparser.add_argument("-o", "--output_dir", help="Where to write each repo's output, log and the summary.", type=str, default="repo-explorer-batch")
+argparser.add_argument("-w", "--workers", help="Number of repos to analyze at once.", type=int, default=os.cpu_count())
+argparser.add_argument("-C", "--enable_cache", help="Enable caching.", action="store_true")
+argparser.add_argument("-L", "--load_cache", help="Load from cache.", action="store_true")
+argparser.add_argument("-R", "--refresh_cache", help="Refresh a loaded cache with new commits.", action="store_true")
+argparser.add_argument("-M", "--impact", help="Enable impact statistics.", action="store_true")
+argparser.add_argument("--backend", help="Data collection backend (gitpython or numstat).", type=str, choices=["gitpython", "numstat"])
+argparser.add_argument("--config", help="Set another option; Group.Option:value;Group2.Option:value", type=str)
+
+# Per-process state for the batch pool
+worker_config_text = None
+worker_options = None
+
+def initBatchWorker(config_text, options):
+    global worker_config_text, worker_options
+    worker_config_text = config_text
+    worker_options = options
+
+def readManifest(path):
+    repos = []
+    base_dir = os.path.dirname(os.path.abspath(path))
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                repos.append(os.path.normpath(os.path.join(base_dir, os.path.expanduser(line))))
+    return repos
+
+def getOutputNames(repos):
+    # Repos are usually told apart by their directory name, number any clashes
+    names = []
+    seen = {}
+    for repo in repos:
+        name = os.path.basename(repo) or "repo"
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else "%s-%d" % (name, seen[name]))
+    return names
+
+def exploreRepo(task):
+    """
+        Run the whole pipeline for one repo, errors are reported rather than
+        raised so one bad repo doesn't stop the batch
+    """
+    repo, name, output_dir = task
+    output_format = worker_options['output_format']
+    output_file = os.path.join(output_dir, "%s.%s" % (name, output_format))
+    log_file = os.path.join(output_dir, name + ".log")
+    result = {"repo": repo, "name": name, "output": output_file, "log": log_file, "status": "ok"}
+    start_time = time.time()
+
+    with open(log_file, "w") as log, contextlib.redirect_stdout(log):
+        try:
+            explorer = Explorer.Explorer(path=repo)
+            explorer.loadConfigString(worker_config_text)
+
+            collect_time = time.time()
+            explorer.collectData(worker_options['load_cache'])
+            result['collect_seconds'] = time.time() - collect_time
+
+            explore_time = time.time()
+            if output_format == "ndjson":
+                explorer.openOutput(output_file)
+            explorer.explore()
+            result['explore_seconds'] = time.time() - explore_time
+
+            explorer.output(file=True, filename=output_file)
+            report = explorer.profiler.getReport()
+            result['commits'] = report['counters'].get("commits", 0)
+            result['phases'] = {phase: stats['wall_seconds'] for (phase, stats) in report['phases'].items()}
+            # Peak for the worker process so far, which may have run other repos first
+            result['worker_peak_rss_kb'] = report['peak_rss_kb']
+        except Exception as e:
+            traceback.print_exc(file=log)
+            result['status'] = "error"
+            result['error'] = "%s: %s" % (type(e).__name__, e)
+
+    result['seconds'] = time.time() - start_time
+    return result
+
+if __name__ == "__main__":
+    args = argparser.parse_args()
+    start_time = time.time()
+
+    print("Loading configurations...")
+    config = configparser.ConfigParser()
+    config.read(args.ini_file)
+
+    # Repos are already spread over the processes, they can't have their own pools
+    config.set('Data Collection', 'jobs', "1")
+    config.set('Dependency Inference', 'code_check_jobs', "1")
+    if args.enable_cache:
+        config.set('General', 'enable_cache', 'true')
+    if args.refresh_cache:
+        config.set('Caching', 'incremental', 'true')
+    if args.impact:
+        config.set('Data Collection', 'impact_stats', 'true')
+    if args.backend is not None:
+        config.set('Data Collection', 'backend', args.backend)
+    if args.config:
+        for setting in args.config.split(";"):
+            option, value = setting.split(":")
+            option_group, option = option.split(".")
+            if not config.has_section(option_group):
+                config.add_section(option_group)
+            config.set(option_group, option, value)
+
+    config_text = io.StringIO()
+    config.write(config_text)
+
+    repos = readManifest(args.manifest)
+    os.makedirs(args.output_dir, exist_ok=True)
+    tasks = [(repo, name, os.path.abspath(args.output_dir)) for (repo, name) in zip(repos, getOutputNames(repos))]
+
+    print("Analyzing %d repos with %d workers..." % (len(tasks), args.workers))
+    results = []
+    pool = multiprocessing.Pool(args.workers, initializer=initBatchWorker, initargs=(config_text.getvalue(),
+        {"load_cache": args.load_cache, "output_format": config.get('Output', 'format', fallback="json")}))
+    try:
+        for result in pool.imap_unordered(exploreRepo, tasks):
+            results.append(result)
+            print("\t[%d/%d] %s: %s in %.1f seconds%s" % (len(results), len(tasks), result['name'], result['status'], result['seconds'],
+                " (%s)" % (result['error']) if result['status'] == "error" else ""))
+    finally:
+        pool.close()
+        pool.join()
+
+    # Back in manifest order, with the slowest repos called out
+    order = {name: i for (i, (repo, name, output_dir)) in enumerate(tasks)}
+    results.sort(key=lambda result: order[result['name']])
+    summary = {
+        "started": int(start_time),
+        "seconds": time.time() - start_time,
+        "workers": args.workers,
+        "repos": len(results),
+        "succeeded": sum(1 for result in results if result['status'] == "ok"),
+        "failed": [result['name'] for result in results if result['status'] == "error"],
+        "slowest": [result['name'] for result in sorted(results, key=lambda result: result['seconds'], reverse=True)[:10]],
+        "results": results
+    }
+
+    summary_file = os.path.join(args.output_dir, "summary.json")
+    with open(summary_file, "w") as f:
+        f.write(json.dumps(summary, indent=4))
+
+    print("Batch complete in %d seconds, %d/%d succeeded.  Summary written to '%s'." % (summary['seconds'], summary['succeeded'], summary['repos'], summary_file))
@@ -0,0 +1,340 @@
+#!/usr/bin/python3
+# RepoExplorer: A utility to quickly familiarize oneself with a code repo.
+# Copyright (C) 2019  Jon Stockton <jonstockton1416@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import argparse
+import contextlib
+import io
+import json
+import os
+import pathlib
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import Explorer
+
+argparser = argparse.ArgumentParser(description="Benchmark repo-explorer against a synthetic git repo.")
+argparser.add_argument("-i", "--ini_file", help="Config file location.", type=str, default=str(pathlib.Path(__file__).parent / "conf" / "repo-explorer.ini"))
+argparser.add_argument("-o", "--output_file", help="Write the JSON results here instead of stdout.", type=str, default=None)
+argparser.add_argument("-w", "--work_dir", help="Where to build the synthetic repo (a temp dir by default).", type=str, default=None)
+argparser.add_argument("--commits", help="Number of commits to generate.", type=int, default=500)
+argparser.add_argument("--files", help="Number of source files in the first commit.", type=int, default=200)
+argparser.add_argument("--files_per_commit", help="Files changed by each commit.", type=int, default=4)
+argparser.add_argument("--file_lines", help="Typical starting size of a file in lines (sizes vary around it).", type=int, default=200)
+argparser.add_argument("--authors", help="Number of distinct authors.", type=int, default=7)
+argparser.add_argument("--rename_rate", help="Chance a commit renames a file.", type=float, default=0.05)
+argparser.add_argument("--delete_rate", help="Chance a commit deletes a file.", type=float, default=0.02)
+argparser.add_argument("--binary_rate", help="Chance a commit adds or changes a binary file.", type=float, default=0.05)
+argparser.add_argument("--merge_rate", help="Chance a commit is a merge of a short lived branch.", type=float, default=0.05)
+argparser.add_argument("--vendor_files", help="Number of files under vendor/ (bumped all at once now and then).", type=int, default=50)
+argparser.add_argument("--doc_files", help="Number of files under docs/.", type=int, default=10)
+argparser.add_argument("--seed", help="Random seed for the generated history.", type=int, default=1)
+argparser.add_argument("--jobs", help="Comma separated worker counts to time with the gitpython backend.", type=str, default="1,2,4")
+argparser.add_argument("--scenario", help="Add a config to time (replaces the defaults); name=Group.Option:value;Group2.Option:value", type=str, action="append")
+argparser.add_argument("--repeat", help="Time each scenario this many times, the fastest run is reported.", type=int, default=1)
+
+# Applied before every scenario: the cache is needed for the round-trip timings
+#  and the diff memo would make every run after the first a cache hit
+BASE_CONFIG = "General.enable_cache:true;Caching.incremental:false;Caching.diff_memo:;Data Collection.impact_stats:true"
+
+def parseConfig(text):
+    # Same syntax as repo-explorer.py --config
+    settings = []
+    for setting in filter(None, text.split(";")):
+        option, value = setting.split(":", 1)
+        option_group, option = option.split(".")
+        settings.append((option_group, option, value))
+    return settings
+
+def getScenarios(args):
+    if args.scenario:
+        scenarios = []
+        for scenario in args.scenario:
+            name, config = scenario.split("=", 1) if "=" in scenario else (scenario, "")
+            scenarios.append((name, config))
+        return scenarios
+
+    scenarios = [("gitpython-jobs-%d" % (jobs), "Data Collection.jobs:%d" % (jobs)) for jobs in [int(j) for j in args.jobs.split(",")]]
+    scenarios += [
+        ("numstat", "Data Collection.backend:numstat"),
+        ("columnar", "Data Collection.store:columnar"),
+        ("numstat-columnar", "Data Collection.backend:numstat;Data Collection.store:columnar"),
+        ("streaming", "Data Collection.store:streaming"),
+        ("numstat-streaming", "Data Collection.backend:numstat;Data Collection.store:streaming"),
+        ("no-impact", "Data Collection.impact_stats:false"),
+        ("no-file-limit", "Data Collection.commit_file_limit:-1"),
+        ("first-parent", "Data Collection.first_parent:true;Data Collection.merges:first_parent"),
+        ("top-breadth", "Dependency Inference.analysis_breadth:top"),
+        ("lazy-impact", "Data Collection.lazy_impact:true"),
+        ("lazy-impact-top", "Data Collection.lazy_impact:true;Dependency Inference.analysis_breadth:top;General.top_contributor:false"),
+        ("neighbor-limit", "Dependency Inference.neighbor_limit:10"),
+        ("threshold-3", "Dependency Inference.threshold:3"),
+        ("scoring", "General.scoring:true")
+    ]
+    return scenarios
+
+def generateRepo(path, commits=500, files=200, files_per_commit=4, file_lines=200, authors=7, rename_rate=0.05,
+                 delete_rate=0.02, binary_rate=0.05, merge_rate=0.05, vendor_files=50, doc_files=10, seed=1):
+    """
+        Build a repo with git fast-import so generating it doesn't dominate the
+        benchmark - the same arguments always produce the same history
+
+        Besides plain edits the history has renames, deletes, binary files,
+        merges of short lived branches, a vendor/ directory that's bumped in
+        one big commit and a docs/ directory.
+    """
+    rng = random.Random(seed)
+    subprocess.run(["git", "init", "-q", path], check=True)
+    contents = {}
+    stream = io.BytesIO()
+    marks = {"next": 1}
+
+    def data(payload):
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        stream.write(b"data %d\n" % (len(payload)))
+        stream.write(payload + b"\n")
+
+    def newLines(file_path):
+        # Most files are small, a few are much bigger
+        lines = max(1, min(int(rng.lognormvariate(0, 0.75) * file_lines), file_lines * 20))
+        return ["line %d of %s\n" % (i, file_path) for i in range(lines)]
+
+    def newBinary():
+        return b"\x89PNG\r\n\x1a\n\x00" + bytes(rng.getrandbits(8) for i in range(rng.randint(256, 4096)))
+
+    def startCommit(ref, number, parent, merge=None):
+        mark = marks['next']
+        marks['next'] += 1
+        author_id = rng.randrange(authors)
+        author = "Author %d <author%d@example.com> %d +0000\n" % (author_id, author_id, 1500000000 + number * 3600)
+        stream.write(b"commit %s\nmark :%d\n" % (ref.encode('utf-8'), mark))
+        stream.write(("author " + author + "committer " + author).encode('utf-8'))
+        data("Commit %d" % (number))
+        if parent is not None:
+            stream.write(b"from :%d\n" % (parent))
+        if merge is not None:
+            stream.write(b"merge :%d\n" % (merge))
+        return mark
+
+    def modify(file_path, payload):
+        stream.write(("M 100644 inline %s\n" % (file_path)).encode('utf-8'))
+        data(payload if isinstance(payload, bytes) else "".join(payload))
+
+    def edit(file_path, number):
+        if isinstance(contents[file_path], bytes):
+            contents[file_path] = newBinary()
+        else:
+            lines = contents[file_path]
+            for i in rng.sample(range(len(lines)), min(5, len(lines))):
+                lines[i] = "changed in %d\n" % (number)
+            lines.append("added in %d\n" % (number))
+        modify(file_path, contents[file_path])
+
+    def sourceFiles():
+        return sorted(file_path for file_path in contents if file_path.startswith("src/"))
+
+    history = []
+    for number in range(1, commits + 1):
+        if number == 1:
+            history.append(startCommit("refs/heads/master", number, None))
+            initial = ["src/module%d/file%d.py" % (file % 10, file) for file in range(files)]
+            initial += ["vendor/lib%d/file%d.php" % (file % 5, file) for file in range(vendor_files)]
+            initial += ["docs/page%d.md" % (file) for file in range(doc_files)]
+            for file_path in initial:
+                contents[file_path] = newLines(file_path)
+                modify(file_path, contents[file_path])
+            for file_path in ["README.md", "conf/app.ini", "tests/test_app.py"]:
+                contents[file_path] = newLines(file_path)
+                modify(file_path, contents[file_path])
+            continue
+
+        # A short lived branch off a recent commit, adding new files, merged back in
+        if rng.random() < merge_rate and len(history) > 3:
+            base = history[-rng.randint(2, min(10, len(history)))]
+            side = startCommit("refs/heads/feature", number, base)
+            added = ["src/feature%d/file%d.py" % (number, file) for file in range(rng.randint(1, 3))]
+            for file_path in added:
+                contents[file_path] = newLines(file_path)
+                modify(file_path, contents[file_path])
+            history.append(startCommit("refs/heads/master", number, history[-1], merge=side))
+            for file_path in added:
+                modify(file_path, contents[file_path])
+            continue
+
+        history.append(startCommit("refs/heads/master", number, history[-1]))
+
+        # Every so often all of vendor/ is bumped at once (usually over commit_file_limit)
+        if vendor_files and number % 100 == 0:
+            for file_path in [file_path for file_path in sorted(contents) if file_path.startswith("vendor/")]:
+                edit(file_path, number)
+            continue
+
+        source_files = sourceFiles()
+        if rng.random() < rename_rate and source_files:
+            old_path = rng.choice(source_files)
+            new_path = "src/module%d/renamed%d.py" % (rng.randrange(10), number)
+            stream.write(("R %s %s\n" % (old_path, new_path)).encode('utf-8'))
+            contents[new_path] = contents.pop(old_path)
+            # Renames usually come with a small edit
+            if rng.random() < 0.5:
+                edit(new_path, number)
+            source_files = sourceFiles()
+
+        if rng.random() < delete_rate and len(source_files) > files_per_commit:
+            file_path = rng.choice(source_files)
+            stream.write(("D %s\n" % (file_path)).encode('utf-8'))
+            del contents[file_path]
+            source_files = sourceFiles()
+
+        if rng.random() < binary_rate:
+            binaries = sorted(file_path for file_path in contents if file_path.startswith("assets/"))
+            file_path = rng.choice(binaries) if binaries and rng.random() < 0.5 else "assets/image%d.png" % (number)
+            contents.setdefault(file_path, b"")
+            edit(file_path, number)
+
+        if doc_files and rng.random() < 0.1:
+            edit(rng.choice(sorted(file_path for file_path in contents if file_path.startswith("docs/"))), number)
+
+        for file_path in rng.sample(source_files, min(files_per_commit, len(source_files))):
+            edit(file_path, number)
+
+    subprocess.run(["git", "fast-import", "--quiet"], cwd=path, input=stream.getvalue(), check=True)
+    subprocess.run(["git", "checkout", "-q", "master"], cwd=path, check=True)
+
+def getSize(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, file)) for file in os.listdir(path))
+    return os.path.getsize(path) if os.path.isfile(path) else 0
+
+def newExplorer(repo_path, ini_file, cache_path, config):
+    explorer = Explorer.Explorer(path=repo_path)
+    explorer.loadConfigs(ini_file)
+    for option_group, option, value in parseConfig(BASE_CONFIG) + parseConfig(config):
+        explorer.setConfig(option_group, option, value)
+    explorer.setConfig('Caching', 'cache_file', cache_path)
+    return explorer
+
+def timeScenario(repo_path, ini_file, work_dir, name, config):
+    """
+        Collect, explore, then load the cache written by the collection into a
+        fresh explorer and explore again - the two explorations should agree
+    """
+    cache_path = os.path.join(work_dir, "%s.cache" % (name))
+    for stale in [cache_path, cache_path + ".columns"]:
+        if os.path.isdir(stale):
+            shutil.rmtree(stale)
+        elif os.path.isfile(stale):
+            os.remove(stale)
+
+    explorer = newExplorer(repo_path, ini_file, cache_path, config)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start_time = time.perf_counter()
+        explorer.collectData()
+        collect_seconds = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        explorer.explore()
+        explore_seconds = time.perf_counter() - start_time
+
+    cached = newExplorer(repo_path, ini_file, cache_path, config)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start_time = time.perf_counter()
+        cached.collectData(from_cache=True)
+        cache_read_seconds = time.perf_counter() - start_time
+        cached.explore()
+
+    commits = explorer.profiler.counters["commits"]
+    report = explorer.profiler.getReport()
+    cache_write = report['phases'].get("cache write")
+    return {
+        "name": name,
+        "config": config,
+        "commits": commits,
+        "collect_seconds": collect_seconds,
+        "explore_seconds": explore_seconds,
+        "cache_write_seconds": cache_write['wall_seconds'] if cache_write else None,
+        "cache_read_seconds": cache_read_seconds,
+        "cache_bytes": getSize(cache_path) + getSize(cache_path + ".columns"),
+        "commits_per_second": commits / collect_seconds if collect_seconds else None,
+        "cache_consistent": json.dumps(explorer.stats, sort_keys=True) == json.dumps(cached.stats, sort_keys=True),
+        "phases": report['phases'],
+        "counters": report['counters']
+    }
+
+def getGitVersion():
+    return subprocess.run(["git", "--version"], stdout=subprocess.PIPE, universal_newlines=True).stdout.strip()
+
+if __name__ == "__main__":
+    args = argparser.parse_args()
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="repo-explorer-bench-")
+    repo_path = os.path.join(work_dir, "repo")
+    generator = {
+        "commits": args.commits,
+        "files": args.files,
+        "files_per_commit": args.files_per_commit,
+        "file_lines": args.file_lines,
+        "authors": args.authors,
+        "rename_rate": args.rename_rate,
+        "delete_rate": args.delete_rate,
+        "binary_rate": args.binary_rate,
+        "merge_rate": args.merge_rate,
+        "vendor_files": args.vendor_files,
+        "doc_files": args.doc_files,
+        "seed": args.seed
+    }
+
+    # A repo left in the work dir is only reused if it was generated with the same parameters
+    generator_path = os.path.join(work_dir, "generator.json")
+    if os.path.isdir(repo_path):
+        if not os.path.isfile(generator_path):
+            argparser.error("%s wasn't generated by this version of the benchmark, remove it or use another work dir" % (repo_path))
+        with open(generator_path, "r") as f:
+            if json.load(f) != generator:
+                print("Synthetic repo in %s was generated with other parameters, removing it..." % (repo_path))
+                shutil.rmtree(repo_path)
+
+    if not os.path.isdir(repo_path):
+        print("Generating synthetic repo in %s..." % (repo_path))
+        if os.path.isfile(generator_path):
+            os.remove(generator_path)
+        generateRepo(repo_path, **generator)
+        with open(generator_path, "w") as f:
+            f.write(json.dumps(generator, indent=4))
+
+    results = {
+        "repo": repo_path,
+        "generator": generator,
+        "environment": {"python": platform.python_version(), "platform": sys.platform, "git": getGitVersion(), "cpus": os.cpu_count()},
+        "scenarios": []
+    }
+    for name, config in getScenarios(args):
+        print("Timing %s..." % (name))
+        runs = [timeScenario(repo_path, args.ini_file, work_dir, name, config) for i in range(args.repeat)]
+        result = min(runs, key=lambda run: run['collect_seconds'])
+        result['runs'] = len(runs)
+        results['scenarios'].append(result)
+        if not result['cache_consistent']:
+            print("\tWarning: results loaded from the cache differ from the collected ones")
+
+    if args.output_file:
+        with open(args.output_file, "w") as f:
+            f.write(json.dumps(results, indent=4))
+    else:
+        print(json.dumps(results, indent=4))
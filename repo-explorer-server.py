@@ -0,0 +1,204 @@
+#!/usr/bin/python3
+# RepoExplorer: A utility to quickly familiarize oneself with a code repo.
+# Copyright (C) 2019  Jon Stockton <jonstockton1416@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import argparse
+import http.server
+import json
+import threading
+import time
+import urllib.parse
+import Explorer
+
+argparser = argparse.ArgumentParser(description="Keep a repo's analysis in memory and answer queries about it over HTTP.")
+argparser.add_argument("repo_path", help="Repo location", type=str)
+argparser.add_argument("-i", "--ini_file", help="Config file location.", type=str, required=True)
+argparser.add_argument("-H", "--host", help="Address to listen on.", type=str, default="127.0.0.1")
+argparser.add_argument("-p", "--port", help="Port to listen on.", type=int, default=8347)
+argparser.add_argument("-r", "--refresh_interval", help="Check for new commits every this many seconds (0 to only refresh on request).", type=int, default=30)
+argparser.add_argument("-c", "--cache_file", help="Cache file location.", type=str, default=None)
+argparser.add_argument("-C", "--enable_cache", help="Enable caching (the cache is loaded at start up and refreshed).", action="store_true")
+argparser.add_argument("-M", "--impact", help="Enable impact statistics.", action="store_true")
+argparser.add_argument("-j", "--jobs", help="Number of diff worker processes.", type=int)
+argparser.add_argument("--backend", help="Data collection backend (gitpython or numstat).", type=str, choices=["gitpython", "numstat"])
+argparser.add_argument("--config", help="Set another option; Group.Option:value;Group2.Option:value", type=str)
+
+class ExplorerService:
+    """
+        Owns the Explorer and publishes immutable snapshots of its results
+
+        Only the refresh (serialized by a lock) touches the Explorer.  Readers
+        just grab the current snapshot, which is replaced as a whole once a
+        refresh has finished, so they never see a half updated model.
+    """
+    def __init__(self, explorer):
+        self.explorer = explorer
+        self.lock = threading.Lock()
+        self.snapshot = None
+
+    def start(self):
+        with self.lock:
+            self.explorer.collectData(self.explorer.config.getboolean('General', 'enable_cache'))
+            self.publish()
+
+    def refresh(self):
+        with self.lock:
+            if self.explorer.refreshData():
+                self.publish()
+                return True
+            return False
+
+    def publish(self):
+        start_time = time.time()
+        self.explorer.explore()
+
+        # Copied so later refreshes (which update data in place) can't show through
+        stats = json.loads(json.dumps(self.explorer.stats))
+        self.snapshot = {
+            "stats": stats,
+            "status": {
+                "head": self.explorer.last_commit,
+                "commits": stats['basic']['total'],
+                "refreshed": int(time.time()),
+                "explore_seconds": time.time() - start_time
+            }
+        }
+
+    def query(self, name, params):
+        """
+            (HTTP status, response) for a query against the current snapshot
+        """
+        snapshot = self.snapshot
+        if name == "status":
+            return (200, snapshot['status'])
+        if any(scope in params for scope in ("since", "until", "path")):
+            return self.scopedQuery(name, params)
+        if name not in snapshot['stats']:
+            return (404, {"error": "Unknown or disabled query: %s" % (name)})
+
+        result = snapshot['stats'][name]
+        if name == "dependencies" and "file" in params:
+            file = params['file'][0]
+            if file not in result:
+                return (404, {"error": "No dependencies known for: %s" % (file)})
+            return (200, {"file": file, "dependencies": result[file]})
+
+        return (200, result)
+
+    def scopedQuery(self, name, params):
+        """
+            Scoped results aren't part of the snapshot, they're worked out from
+            the model's commit index (so this waits for any refresh to finish)
+        """
+        queries = {
+            "most_changed": self.explorer.findMostChanged,
+            "top_contributor": self.explorer.findTopContributor,
+            "dependencies": self.explorer.inferDependencies
+        }
+        if name not in queries:
+            return (400, {"error": "Query can't be scoped: %s" % (name)})
+
+        try:
+            with self.lock:
+                scope = self.explorer.makeScope(*[params.get(scope, [None])[0] for scope in ("since", "until", "path")])
+                result = queries[name](scope)
+        except ValueError as e:
+            return (400, {"error": str(e)})
+        return (200, json.loads(json.dumps(result)))
+
+def makeHandler(service):
+    class QueryHandler(http.server.BaseHTTPRequestHandler):
+        """
+            GET /status, /basic, /structures, /most_changed, /top_contributor,
+              /dependencies[?file=<path>], /scores
+            most_changed, top_contributor and dependencies also take since,
+              until and path parameters (see [Scope] in the config)
+            POST /refresh
+        """
+        def respond(self, status, response):
+            body = json.dumps(response).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urllib.parse.urlparse(self.path)
+            self.respond(*service.query(url.path.strip("/"), urllib.parse.parse_qs(url.query)))
+
+        def do_POST(self):
+            if urllib.parse.urlparse(self.path).path.strip("/") != "refresh":
+                self.respond(404, {"error": "Unknown action: %s" % (self.path)})
+                return
+            updated = service.refresh()
+            self.respond(200, dict(service.snapshot['status'], updated=updated))
+
+        def log_message(self, format, *args):
+            pass
+
+    return QueryHandler
+
+def refreshPeriodically(service, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            service.refresh()
+        except Exception as e:
+            # Keep serving the last good snapshot
+            print("\tRefresh failed: %s" % (e))
+
+if __name__ == "__main__":
+    args = argparser.parse_args()
+
+    print("Creating the explorer...")
+    explorer = Explorer.Explorer(path=args.repo_path)
+
+    print("Loading configurations...")
+    explorer.loadConfigs(args.ini_file)
+
+    # The server only makes sense picking up where the cache left off
+    explorer.setConfig('Caching', 'incremental', 'true')
+    if args.enable_cache:
+        explorer.setConfig('General', 'enable_cache', 'true')
+    if args.cache_file is not None:
+        explorer.setConfig('Caching', 'cache_file', args.cache_file)
+    if args.impact:
+        explorer.setConfig('Data Collection', 'impact_stats', 'true')
+    if args.jobs is not None:
+        explorer.setConfig('Data Collection', 'jobs', str(args.jobs))
+    if args.backend is not None:
+        explorer.setConfig('Data Collection', 'backend', args.backend)
+    if args.config:
+        for setting in args.config.split(";"):
+            option, value = setting.split(":")
+            option_group, option = option.split(".")
+            explorer.setConfig(option_group, option, value)
+
+    print("Collecting data...")
+    service = ExplorerService(explorer)
+    service.start()
+
+    if args.refresh_interval > 0:
+        threading.Thread(target=refreshPeriodically, args=(service, args.refresh_interval), daemon=True).start()
+
+    server = http.server.ThreadingHTTPServer((args.host, args.port), makeHandler(service))
+    print("Serving %s on http://%s:%d/..." % (args.repo_path, args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -27,7 +27,9 @@ argparser.add_argument("-o", "--output_file", help="Output file location.", type
 argparser.add_argument("-c", "--cache_file", help="Cache file location.", type=str, default=None)
 argparser.add_argument("-C", "--enable_cache", help="Enable caching.", action="store_true")
 argparser.add_argument("-L", "--load_cache", help="Load from cache.", action="store_true")
+argparser.add_argument("-R", "--refresh_cache", help="Refresh a loaded cache with new commits.", action="store_true")
 argparser.add_argument("-F", "--to_file", help="Write output to file.", action="store_true")
+argparser.add_argument("--format", help="Output file format, ndjson writes each phase as it finishes.", type=str, choices=["json", "ndjson"])
 argparser.add_argument("-T", "--tops", help="Enable top contributor and most changed file.", action="store_true")
 argparser.add_argument("-D", "--dependency_inference", help="Enable dependency inference.", action="store_true")
 argparser.add_argument("-S", "--structure_id", help="Enable structure identification.", action="store_true")
@@ -37,6 +39,13 @@ argparser.add_argument("--full_diff", help="Enable full diff storage.", action="
 argparser.add_argument("-l", "--commit_limit", help="Commit file limmit.", type=int)
 argparser.add_argument("-s", "--structures", help="Structure additions.", type=str)
 argparser.add_argument("-M", "--impact", help="Enable impact statistics.", action="store_true")
+argparser.add_argument("-j", "--jobs", help="Number of diff worker processes.", type=int)
+argparser.add_argument("--backend", help="Data collection backend (gitpython or numstat).", type=str, choices=["gitpython", "numstat"])
+argparser.add_argument("--since", help="Only analyze commits since this date (unix time, YYYY-MM-DD or e.g. 90d).", type=str)
+argparser.add_argument("--until", help="Only analyze commits until this date, inclusive (unix time, YYYY-MM-DD for the end of that day or e.g. 90d).", type=str)
+argparser.add_argument("--path", help="Only analyze files under this path.", type=str)
+argparser.add_argument("-P", "--profile", help="Write a per-phase timing report next to the output file.", action="store_true")
+argparser.add_argument("--cprofile", help="Dump cProfile stats next to the output file.", action="store_true")
 argparser.add_argument("--config", help="Set another option; Group.Option:value;Group2.Option:value", type=str)
 
 # @todo More config overrides...
@@ -56,6 +65,10 @@ if args.enable_cache:
     print("\tEnabling cache...")
     explorer.setConfig('General', 'enable_cache', 'true')
 
+if args.refresh_cache:
+    print("\tEnabling incremental cache refresh...")
+    explorer.setConfig('Caching', 'incremental', 'true')
+
 if args.cache_file is not None:
     print("\tSetting Caching.cache_file to: %s..." % (args.cache_file))
     explorer.setConfig('Caching', 'cache_file', args.cache_file)
@@ -108,6 +121,30 @@ if args.impact:
     print("\tEnabling impact statistics...")
     explorer.setConfig('Data Collection', 'impact_stats', 'true')
 
+if args.jobs is not None:
+    print("\tSetting the number of diff workers to: %d..." % (args.jobs))
+    explorer.setConfig('Data Collection', 'jobs', str(args.jobs))
+
+if args.backend is not None:
+    print("\tSetting the data collection backend to: %s..." % (args.backend))
+    explorer.setConfig('Data Collection', 'backend', args.backend)
+
+if args.since is not None:
+    print("\tOnly analyzing commits since: %s..." % (args.since))
+    explorer.setConfig('Scope', 'since', args.since)
+
+if args.until is not None:
+    print("\tOnly analyzing commits until: %s..." % (args.until))
+    explorer.setConfig('Scope', 'until', args.until)
+
+if args.path is not None:
+    print("\tOnly analyzing files under: %s..." % (args.path))
+    explorer.setConfig('Scope', 'path', args.path)
+
+if args.format is not None:
+    print("\tSetting the output format to: %s..." % (args.format))
+    explorer.setConfig('Output', 'format', args.format)
+
 if args.config:
     print("\tSetting misc configurations...")
     for setting in args.config.split(";"):
@@ -116,11 +153,25 @@ if args.config:
         print("\t\tSetting %s in %s to '%s'..." % (option_group, option, value))
         explorer.setConfig(option_group, option, value)
 
+if args.cprofile:
+    explorer.profiler.startProfile()
+
 print("Collecting data...")
 explorer.collectData(args.load_cache)
 print("\tData collection completed in %d seconds." % (time.time()-start_time))
 print("Exploring...")
+if args.to_file and explorer.getOutputFormat() == "ndjson":
+    print("\tWriting results to '%s' as they're found..." % (args.output_file))
+    explorer.openOutput(args.output_file)
 explorer.explore()
 print("Full process complete in %d seconds." % (time.time()-start_time))
 explorer.output(file=args.to_file, filename=args.output_file)
 
+if args.profile:
+    print("Writing profile report to '%s.profile.json'..." % (args.output_file))
+    explorer.profiler.writeReport("%s.profile.json" % (args.output_file))
+
+if args.cprofile:
+    print("Writing cProfile stats to '%s.prof'..." % (args.output_file))
+    explorer.profiler.dumpProfile("%s.prof" % (args.output_file))
+
@@ -0,0 +1,41 @@
+import unittest
+
+import CoChangeMatrix
+import FileScores
+
+class FileScorerTest(unittest.TestCase):
+    def setUp(self):
+        # a.py always changes with b.py, c.py changes with a.py once in a.py's 5 commits
+        self.matrix = CoChangeMatrix.CoChangeMatrix()
+        commits = [["a.py", "b.py"], ["a.py", "b.py", "c.py"], ["a.py", "b.py"], ["a.py", "b.py"], ["a.py", "b.py"], ["c.py"]]
+        for commit in commits:
+            self.matrix.addCommit([(path, True) for path in commit])
+        self.matrix.build()
+        self.changes = [sum(path in commit for commit in commits) for path in self.matrix.paths]
+        self.ids = self.matrix.ids
+
+    def testChances(self):
+        scorer = FileScores.FileScorer()
+        chances = scorer.getChances(len(self.matrix.paths), self.matrix.getEdges(), self.changes)
+        self.assertTrue(all(chance <= 1 for row in chances for chance in row.values()))
+        self.assertEqual(chances[self.ids["a.py"]][self.ids["b.py"]], 1.0)
+        self.assertEqual(chances[self.ids["a.py"]][self.ids["c.py"]], 0.2)
+        self.assertEqual(chances[self.ids["c.py"]][self.ids["a.py"]], 0.5)
+
+    @unittest.skipIf(FileScores.numpy is None, "NumPy/SciPy aren't installed")
+    def testSparseChances(self):
+        scorer = FileScores.FileScorer()
+        size = len(self.matrix.paths)
+        sparse = scorer.getSparseChances(size, self.matrix.getEdges(), self.changes).toarray()
+        self.assertLessEqual(sparse.max(), 1)
+        for file, row in enumerate(scorer.getChances(size, self.matrix.getEdges(), self.changes)):
+            for related_file, chance in row.items():
+                self.assertAlmostEqual(sparse[file, related_file], chance)
+
+    def testScores(self):
+        downstream, fragility = FileScores.FileScorer().score(self.matrix.paths, self.matrix.getEdges(), self.changes, self.changes)
+        self.assertEqual(max(downstream.values()), 1.0)
+        self.assertTrue(all(0 <= score <= 1 for score in fragility.values()))
+
+if __name__ == '__main__':
+    unittest.main()
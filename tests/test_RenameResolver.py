@@ -0,0 +1,39 @@
+import unittest
+
+from RenameResolver import RenameResolver
+
+class RenameResolverTest(unittest.TestCase):
+    def testChain(self):
+        resolver = RenameResolver()
+        resolver.rename("a.py", "b.py")
+        resolver.rename("b.py", "c.py")
+        self.assertEqual(resolver.resolve("a.py"), "c.py")
+        self.assertEqual(resolver.resolve("b.py"), "c.py")
+        self.assertEqual(resolver.resolve("other.py"), "other.py")
+
+    def testReusedPath(self):
+        # a.py is renamed away, a new a.py is added and renamed somewhere else
+        resolver = RenameResolver()
+        resolver.rename("a.py", "keep/b.py")
+        resolver.rename("a.py", "move/c.py")
+        self.assertEqual(resolver.resolve("keep/b.py"), "keep/b.py")
+        self.assertEqual(resolver.resolve("move/c.py"), "move/c.py")
+        self.assertEqual(resolver.resolve("a.py"), "move/c.py")
+
+    def testRenameBack(self):
+        resolver = RenameResolver()
+        resolver.rename("a.py", "b.py")
+        resolver.rename("b.py", "a.py")
+        self.assertEqual(resolver.resolve("b.py"), "a.py")
+        self.assertEqual(resolver.resolve("a.py"), "a.py")
+
+    def testSerialize(self):
+        resolver = RenameResolver()
+        resolver.rename("a.py", "keep/b.py")
+        resolver.rename("a.py", "move/c.py")
+        restored = RenameResolver.unserialize(resolver.serialize())
+        for path in ("a.py", "keep/b.py", "move/c.py"):
+            self.assertEqual(restored.resolve(path), resolver.resolve(path))
+
+if __name__ == '__main__':
+    unittest.main()